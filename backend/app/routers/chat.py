@@ -18,9 +18,22 @@ from app.services.mm_provider import PageImageInput, get_multimodal_provider
 from app.services.llm_router import llm_router
 from app.services.rag_engine import rag_engine
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 router = APIRouter()
 
 
+def _sse_json(payload: dict) -> str:
+    """Encode one SSE event payload; a stream emits one per LLM delta, so use orjson when available."""
+    if HAS_ORJSON:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(payload)
+
+
 def _estimate_context_tokens(chunks: list[TextChunk]) -> int:
     # Lightweight estimate to keep metrics cheap: ~4 chars per token.
     total_chars = sum(len((chunk.content or "").strip()) for chunk in chunks)
@@ -137,7 +150,7 @@ async def chat(request: ChatRequest):
     async def event_generator():
         yield {
             "event": "message",
-            "data": json.dumps(
+            "data": _sse_json(
                 {
                     "type": "thinking",
                     "content": f"正在检索相关内容... 已找到 {len(chunks)} 个片段。",
@@ -165,7 +178,7 @@ async def chat(request: ChatRequest):
             except Exception as exc:
                 yield {
                     "event": "message",
-                    "data": json.dumps({"type": "error", "content": f"加载页面图像失败: {exc}"}),
+                    "data": _sse_json({"type": "error", "content": f"加载页面图像失败: {exc}"}),
                 }
                 return
 
@@ -179,7 +192,7 @@ async def chat(request: ChatRequest):
 
             yield {
                 "event": "message",
-                "data": json.dumps({"type": "references", "refs": visual_refs}),
+                "data": _sse_json({"type": "references", "refs": visual_refs}),
             }
 
             vision_prompt = llm_router.build_multimodal_prompt(
@@ -206,7 +219,7 @@ async def chat(request: ChatRequest):
                     error_message = f"多模态模型调用失败: {error_message}"
                 yield {
                     "event": "message",
-                    "data": json.dumps({"type": "error", "content": error_message}),
+                    "data": _sse_json({"type": "error", "content": error_message}),
                 }
                 return
 
@@ -233,17 +246,17 @@ async def chat(request: ChatRequest):
             final_refs = list(dict.fromkeys(llm_router.extract_ref_ids(answer_text)))
             yield {
                 "event": "message",
-                "data": json.dumps({"type": "content", "text": answer_text, "active_refs": final_refs}),
+                "data": _sse_json({"type": "content", "text": answer_text, "active_refs": final_refs}),
             }
             yield {
                 "event": "message",
-                "data": json.dumps({"type": "done", "final_refs": final_refs}),
+                "data": _sse_json({"type": "done", "final_refs": final_refs}),
             }
             return
 
         yield {
             "event": "message",
-            "data": json.dumps({"type": "references", "refs": refs_data}),
+            "data": _sse_json({"type": "references", "refs": refs_data}),
         }
 
         # 检索不到内容时，不调用 LLM，避免空上下文幻觉。
@@ -281,11 +294,11 @@ async def chat(request: ChatRequest):
 
             yield {
                 "event": "message",
-                "data": json.dumps({"type": "content", "text": hint, "active_refs": []}),
+                "data": _sse_json({"type": "content", "text": hint, "active_refs": []}),
             }
             yield {
                 "event": "message",
-                "data": json.dumps({"type": "done", "final_refs": []}),
+                "data": _sse_json({"type": "done", "final_refs": []}),
             }
 
             try:
@@ -330,7 +343,7 @@ async def chat(request: ChatRequest):
 
                 yield {
                     "event": "message",
-                    "data": json.dumps(
+                    "data": _sse_json(
                         {
                             "type": "content",
                             "text": chunk["content"],
@@ -362,13 +375,13 @@ async def chat(request: ChatRequest):
 
                 yield {
                     "event": "message",
-                    "data": json.dumps({"type": "done", "final_refs": list(all_refs)}),
+                    "data": _sse_json({"type": "done", "final_refs": list(all_refs)}),
                 }
 
             elif chunk["type"] == "error":
                 yield {
                     "event": "message",
-                    "data": json.dumps({"type": "error", "content": chunk["content"]}),
+                    "data": _sse_json({"type": "error", "content": chunk["content"]}),
                 }
 
     return EventSourceResponse(event_generator())
@@ -39,7 +39,7 @@ from app.services.parser import generate_thumbnail, get_ocr_required_pages, proc
 from app.services.rag_engine import rag_engine
 from app.services.word_converter import (
     WordConversionError,
-    convert_to_pdf,
+    convert_to_pdf_async,
     extract_markdown_with_markitdown,
 )
 
@@ -65,6 +65,7 @@ audit_progress: Dict[str, Dict[str, Any]] = {}
 KEEP_PDF = os.getenv("KEEP_PDF", "1").strip().lower() in {"1", "true", "yes", "y"}
 VALID_OCR_STATUS = {"unrecognized", "processing", "recognized", "failed"}
 ENABLE_MULTIMODAL_AUDIT = os.getenv("ENABLE_MULTIMODAL_AUDIT", "1").strip().lower() in {"1", "true", "yes", "y"}
+OCR_CONCURRENCY = max(1, int(os.getenv("OCR_CONCURRENCY", "3") or "3"))
 ALLOWED_UPLOAD_FORMATS = {"pdf", "doc", "docx"}
 WORD_UPLOAD_FORMATS = {"doc", "docx"}
 
@@ -738,9 +739,9 @@ def _save_ocr_page_result(
     document_store.save_ocr_result(doc_id, payload)
 
 
-def _clear_page_ocr_chunks(doc_id: str, page_num: int) -> None:
+async def _clear_page_ocr_chunks(doc_id: str, page_num: int) -> None:
     try:
-        rag_engine.collection.delete(where={"doc_id": doc_id, "page": page_num, "source": "ocr"})
+        await rag_engine.delete_page_ocr_chunks(doc_id, page_num)
     except Exception:
         # Best effort only.
         pass
@@ -902,26 +903,39 @@ async def run_ocr_worker() -> None:
             failures = 0
             processed_pages: List[int] = []
             canceled = False
+            semaphore = asyncio.Semaphore(OCR_CONCURRENCY)
+
+            # Pages are independent: recognize_document_page only holds the document lock
+            # around status updates, so up to OCR_CONCURRENCY pages run OCR and indexing at once.
+            async def _recognize_one(page_num: int) -> None:
+                nonlocal failures, canceled
+                async with semaphore:
+                    if canceled or doc_id in ocr_cancel_flags:
+                        canceled = True
+                        return
+                    try:
+                        await recognize_document_page(doc_id, page_num, api_key=job.api_key)
+                    except Exception as exc:
+                        failures += 1
+                        logger.warning("Failed to recognize page %s of %s: %s", page_num, doc_id, str(exc))
+                    finally:
+                        processed_pages.append(page_num)
+                        await _release_queued_pages(doc_id, [page_num])
+                        done = len(processed_pages)
+                        _set_doc_progress(
+                            doc_id,
+                            stage="ocr",
+                            current=int(done / max(total, 1) * 100),
+                            message=f"Background OCR in progress ({done}/{total})...",
+                        )
 
-            for idx, page_num in enumerate(pages, start=1):
-                if doc_id in ocr_cancel_flags:
-                    canceled = True
-                    break
-
-                _set_doc_progress(
-                    doc_id,
-                    stage="ocr",
-                    current=int((idx - 1) / max(total, 1) * 100),
-                    message=f"Background OCR in progress ({idx}/{total})...",
-                )
-                try:
-                    await recognize_document_page(doc_id, page_num, api_key=job.api_key)
-                except Exception as exc:
-                    failures += 1
-                    logger.warning("Failed to recognize page %s of %s: %s", page_num, doc_id, str(exc))
-                finally:
-                    processed_pages.append(page_num)
-                    await _release_queued_pages(doc_id, [page_num])
+            _set_doc_progress(
+                doc_id,
+                stage="ocr",
+                current=0,
+                message=f"Background OCR in progress (0/{total})...",
+            )
+            await asyncio.gather(*(_recognize_one(page_num) for page_num in pages))
 
             if canceled:
                 remaining = [page for page in pages if page not in set(processed_pages)]
@@ -1393,7 +1407,7 @@ async def recognize_document_page(doc_id: str, page_num: int, api_key: Optional[
         if not chunks:
             raise HTTPException(status_code=422, detail=f"第 {page_num} 页 OCR 结果为空")
 
-        _clear_page_ocr_chunks(doc_id, page_num)
+        await _clear_page_ocr_chunks(doc_id, page_num)
         indexed_count = await rag_engine.index_ocr_result(
             doc_id,
             page_num,
@@ -1734,7 +1748,8 @@ async def upload_document(
         ocr_mode = "manual"
 
     content = await file.read()
-    sha256 = hashlib.sha256(content).hexdigest()
+    # hashlib releases the GIL on large buffers; hash off the event loop so big uploads do not stall it.
+    sha256 = (await asyncio.to_thread(hashlib.sha256, content)).hexdigest()
 
     existing = document_store.get_by_sha256(sha256)
     if existing and existing.get("status") == "completed":
@@ -1781,7 +1796,7 @@ async def upload_document(
         with open(source_file_path, "wb") as handle:
             handle.write(content)
         try:
-            converted = convert_to_pdf(source_file_path, file_path)
+            converted = await convert_to_pdf_async(source_file_path, file_path)
             file_path = converted.output_pdf_path
             conversion_status = "ok"
             conversion_ms = int(converted.elapsed_ms)
@@ -2060,7 +2075,7 @@ async def attach_document_pdf(doc_id: str, file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="仅支持 PDF 文件")
 
     content = await file.read()
-    sha256 = hashlib.sha256(content).hexdigest()
+    sha256 = (await asyncio.to_thread(hashlib.sha256, content)).hexdigest()
 
     meta = document_store.get_by_doc_id(doc_id) or {}
     expected_sha = str(meta.get("sha256") or "").strip().lower()
@@ -2110,7 +2125,7 @@ async def delete_document(doc_id: str):
             except Exception:
                 pass
 
-    rag_engine.delete_document(doc_id)
+    await rag_engine.delete_document(doc_id)
     document_store.delete_doc(doc_id)
     document_store.delete_chat(doc_id)
     document_store.delete_compliance(doc_id)
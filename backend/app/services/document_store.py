@@ -17,11 +17,12 @@ Storage layout (relative to backend working dir):
 
 from __future__ import annotations
 
+import copy
 import json
 import os
 import threading
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 
 def _atomic_write_json(path: Path, data: Any) -> None:
@@ -42,6 +43,8 @@ class DocumentStore:
         self.compliance_dir = self.base_dir / "compliance"
         self.multimodal_audit_dir = self.base_dir / "multimodal_audit"
         self._lock = threading.RLock()
+        # Parsed audit_profiles.json keyed by (st_mtime_ns, st_size); every profile read goes through it.
+        self._audit_profiles_cache: Optional[Tuple[Tuple[int, int], Dict[str, Any]]] = None
 
     def _ensure_dirs(self) -> None:
         self.base_dir.mkdir(parents=True, exist_ok=True)
@@ -300,8 +303,16 @@ class DocumentStore:
     def load_audit_profiles(self) -> Optional[Dict[str, Any]]:
         self._ensure_dirs()
         path = self.audit_profiles_path
-        if not path.exists():
+        try:
+            stat = path.stat()
+        except OSError:
             return None
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._audit_profiles_cache
+        if cached is not None and cached[0] == key:
+            # Callers mutate and re-save the payload, so never hand out the cached object itself.
+            return copy.deepcopy(cached[1])
         try:
             data = json.loads(path.read_text(encoding="utf-8"))
             if not isinstance(data, dict):
@@ -310,14 +321,18 @@ class DocumentStore:
             if not isinstance(profiles, list):
                 data["profiles"] = []
             data.setdefault("version", 1)
-            return data
         except Exception:
             return None
+        with self._lock:
+            self._audit_profiles_cache = (key, copy.deepcopy(data))
+        return data
 
     def save_audit_profiles(self, payload: Dict[str, Any]) -> None:
         with self._lock:
             self._ensure_dirs()
             _atomic_write_json(self.audit_profiles_path, payload)
+            # Drop the cache explicitly: coarse filesystem mtimes could otherwise hide a same-size rewrite.
+            self._audit_profiles_cache = None
 
     def save_ocr_result(self, doc_id: str, payload: Dict[str, Any]) -> None:
         with self._lock:
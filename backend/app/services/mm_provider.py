@@ -2,15 +2,32 @@
 
 from __future__ import annotations
 
+import asyncio
+import copy
+import hashlib
 import json
 import os
 import re
+import time
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import httpx
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import h2  # noqa: F401  -- httpx only negotiates HTTP/2 when the h2 package is installed
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
 
 @dataclass(slots=True)
 class PageImageInput:
@@ -103,6 +120,9 @@ class MultimodalProvider(ABC):
     ) -> Dict[str, Any]:
         """Analyze multiple page images and return structured JSON data."""
 
+    async def close(self) -> None:
+        """Release pooled resources (called from the app shutdown hook)."""
+
 
 class OpenAICompatibleMultimodalProvider(MultimodalProvider):
     """Multimodal provider for OpenAI-compatible chat completions endpoints."""
@@ -112,6 +132,34 @@ class OpenAICompatibleMultimodalProvider(MultimodalProvider):
     def __init__(self) -> None:
         self.timeout_sec = int(os.getenv("MULTIMODAL_AUDIT_TIMEOUT_SEC", "90") or "90")
         self.retry_count = int(os.getenv("MULTIMODAL_AUDIT_RETRY", "1") or "1")
+        self._http: Optional[httpx.AsyncClient] = None
+        # Answers for recently analyzed page sets (chat follow-ups often resend the same pages),
+        # keyed by a digest of images + prompt + model, plus the calls currently in flight.
+        self.cache_size = max(0, int(os.getenv("MULTIMODAL_CACHE_SIZE", "256") or "256"))
+        self.cache_ttl_sec = float(os.getenv("MULTIMODAL_CACHE_TTL_SEC", "3600") or "3600")
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # In-flight calls are shared across API keys, but their failures are not (auth and quota
+        # errors belong to one key), so each entry records a digest of the owner's key.
+        self._inflight: Dict[str, Tuple[asyncio.Future, str]] = {}
+        # Recent failures per (request, key) digest, so retries of a failing call do not hammer
+        # the provider; the short TTL lets transient errors clear quickly (0 disables).
+        self.error_cache_ttl_sec = float(os.getenv("MULTIMODAL_ERROR_CACHE_TTL_SEC", "30") or "30")
+        self._failures: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Shared keep-alive client for page image calls, created on first use."""
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                http2=HAS_HTTP2,
+                timeout=float(self.timeout_sec),
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+            )
+        return self._http
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
 
     async def analyze_pages(
         self,
@@ -140,20 +188,98 @@ class OpenAICompatibleMultimodalProvider(MultimodalProvider):
             model=final_model,
             provider=provider,
         )
+        # Page images are multi-MB base64 strings; serialize the body once (in C when orjson is
+        # available) and reuse it for the cache key and every retry.
+        body = orjson.dumps(payload) if HAS_ORJSON else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        free_text = json_schema is None
+        if self.cache_size <= 0:
+            return await self._request(body, final_api_key, final_base_url, resolved, free_text=free_text)
+
+        key = self._cache_key(body, final_base_url, free_text)
+        cached = self._cache.get(key)
+        if cached is not None:
+            if time.monotonic() - cached[0] < self.cache_ttl_sec:
+                self._cache.move_to_end(key)
+                return copy.deepcopy(cached[1])
+            del self._cache[key]
+
+        key_digest = hashlib.blake2b(final_api_key.encode("utf-8"), digest_size=16).hexdigest()
+        failed = self._failures.get((key, key_digest))
+        if failed is not None:
+            if time.monotonic() < failed[0]:
+                raise RuntimeError(failed[1])
+            del self._failures[(key, key_digest)]
+
+        while True:
+            entry = self._inflight.get(key)
+            if entry is None:
+                break
+            inflight, owner_digest = entry
+            try:
+                return copy.deepcopy(await asyncio.shield(inflight))
+            except asyncio.CancelledError:
+                # The caller that owned the request was cancelled (e.g. its SSE client went
+                # away), not this one: issue the request here, or join whoever already did.
+                if not inflight.cancelled():
+                    raise
+            except Exception:
+                # Another key's failure (auth, quota) says nothing about this key; retry with it.
+                if owner_digest == key_digest:
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        # Mark failures as retrieved so an unshared failed call does not log a warning.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = (future, key_digest)
+        try:
+            result = await self._request(body, final_api_key, final_base_url, resolved, free_text=free_text)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            if self.error_cache_ttl_sec > 0:
+                self._failures[(key, key_digest)] = (time.monotonic() + self.error_cache_ttl_sec, str(exc))
+                while len(self._failures) > self.cache_size:
+                    self._failures.popitem(last=False)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        future.set_result(result)
+        self._cache[key] = (time.monotonic(), result)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return copy.deepcopy(result)
+
+    def _cache_key(self, body: bytes, base_url: str, free_text: bool) -> str:
+        """Digest of everything that determines the answer except the API key (answers are shared)."""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{base_url}\0{int(free_text)}\0".encode("utf-8"))
+        digest.update(body)
+        return digest.hexdigest()
+
+    async def _request(
+        self,
+        body: bytes,
+        api_key: str,
+        base_url: str,
+        resolved: Dict[str, str],
+        *,
+        free_text: bool,
+    ) -> Dict[str, Any]:
         headers = {
-            "Authorization": f"Bearer {final_api_key}",
+            "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
         }
-
         last_exc: Exception | None = None
         attempts = max(1, self.retry_count + 1)
         for _ in range(attempts):
             try:
-                async with httpx.AsyncClient(timeout=float(self.timeout_sec)) as client:
-                    response = await client.post(final_base_url, headers=headers, json=payload)
-                    response.raise_for_status()
-                    data = response.json()
-                return self._extract_structured_json(data, free_text=(json_schema is None), provider=provider)
+                response = await self._get_http_client().post(base_url, headers=headers, content=body)
+                response.raise_for_status()
+                data = orjson.loads(response.content) if HAS_ORJSON else response.json()
+                return self._extract_structured_json(data, free_text=free_text, provider=resolved["provider"])
             except httpx.HTTPStatusError as exc:
                 raise RuntimeError(self._format_http_status_error(exc, resolved["label"])) from exc
             except Exception as exc:  # noqa: BLE001
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import os
 import re
@@ -14,6 +15,9 @@ from app.services.rag_engine import rag_engine
 
 ProgressCallback = Callable[[str, int, int, str], Awaitable[None] | None]
 
+_OVERLAP_TOKEN_RE = re.compile(r"[\u4e00-\u9fff]+|[A-Za-z0-9]+")
+_STATUS_ORDER = {"fail": 3, "pass": 2, "needs_review": 1}
+
 
 class MultimodalAuditService:
     """Run multimodal audit with editable profile rules and RAG calibration."""
@@ -21,6 +25,8 @@ class MultimodalAuditService:
     def __init__(self) -> None:
         self.page_batch_size = max(1, int(os.getenv("MULTIMODAL_AUDIT_PAGE_BATCH", "6") or "6"))
         self.max_pages = max(1, int(os.getenv("MULTIMODAL_AUDIT_MAX_PAGES", "120") or "120"))
+        # Page batches are independent network-bound calls; cap how many are in flight per audit.
+        self.batch_concurrency = max(1, int(os.getenv("MULTIMODAL_AUDIT_CONCURRENCY", "4") or "4"))
 
     async def run_audit(
         self,
@@ -159,36 +165,62 @@ class MultimodalAuditService:
             bidder_name=bidder_name,
         )
         schema = self._build_json_schema(allowed_rule_ids)
-        all_candidates: List[Dict[str, Any]] = []
-
         total_batches = max(1, (len(page_images) + self.page_batch_size - 1) // self.page_batch_size)
-        for index in range(total_batches):
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+        completed = 0
+
+        async def run_batch(index: int) -> List[Dict[str, Any]]:
+            nonlocal completed
             start = index * self.page_batch_size
             batch = page_images[start : start + self.page_batch_size]
             batch_pages = {image.page for image in batch}
+            async with semaphore:
+                payload = await provider.analyze_pages(
+                    images=batch,
+                    prompt=prompt,
+                    json_schema=schema,
+                    api_key=api_key,
+                    model=model,
+                    provider_name=provider_name,
+                    base_url=base_url,
+                )
+            completed += 1
             await self._emit_progress(
                 progress_callback,
                 "vision_analyzing",
-                index,
+                completed,
                 total_batches,
-                f"视觉识别中（批次 {index + 1}/{total_batches}）",
-            )
-            payload = await provider.analyze_pages(
-                images=batch,
-                prompt=prompt,
-                json_schema=schema,
-                api_key=api_key,
-                model=model,
-                provider_name=provider_name,
-                base_url=base_url,
+                f"视觉识别中（已完成 {completed}/{total_batches} 批）",
             )
             results = payload.get("results") if isinstance(payload, dict) else None
             if not isinstance(results, list):
-                continue
+                return []
+            batch_candidates: List[Dict[str, Any]] = []
             for item in results:
                 normalized = self._normalize_rule_result(item, allowed_rule_ids, batch_pages)
                 if normalized:
-                    all_candidates.append(normalized)
+                    batch_candidates.append(normalized)
+            return batch_candidates
+
+        await self._emit_progress(
+            progress_callback,
+            "vision_analyzing",
+            0,
+            total_batches,
+            f"视觉识别中（共 {total_batches} 批）",
+        )
+        # gather keeps batch order, so aggregation tie-breaking matches the sequential loop.
+        tasks = [asyncio.ensure_future(run_batch(index)) for index in range(total_batches)]
+        try:
+            batch_results = await asyncio.gather(*tasks)
+        except BaseException:
+            # gather does not cancel siblings when one batch fails; left running they would keep
+            # calling the provider and report progress over the failed job's final state.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        all_candidates = [candidate for batch_candidates in batch_results for candidate in batch_candidates]
 
         await self._emit_progress(progress_callback, "vision_analyzing", total_batches, total_batches, "视觉识别完成")
         return all_candidates
@@ -230,15 +262,21 @@ class MultimodalAuditService:
         enabled_rules: List[Dict[str, str]],
         candidates: List[Dict[str, Any]],
     ) -> List[Dict[str, Any]]:
-        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        # One pass keeps the best-ranked candidate per rule (first wins on ties), so the rule
+        # loop below is a dict lookup instead of a per-rule regroup and sort.
+        best_by_rule: Dict[str, Tuple[Tuple[int, float, int], Dict[str, Any]]] = {}
         for candidate in candidates:
-            grouped.setdefault(candidate["rule_id"], []).append(candidate)
+            rank = self._candidate_rank(candidate)
+            current = best_by_rule.get(candidate["rule_id"])
+            if current is None or rank > current[0]:
+                best_by_rule[candidate["rule_id"]] = (rank, candidate)
 
         items: List[Dict[str, Any]] = []
         for rule in enabled_rules:
             rule_id = rule["id"]
             title = rule["title"] or rule_id
-            chosen = self._pick_best_candidate(grouped.get(rule_id) or [])
+            best = best_by_rule.get(rule_id)
+            chosen = best[1] if best else None
             if not chosen:
                 items.append(
                     self._item(
@@ -273,19 +311,12 @@ class MultimodalAuditService:
             )
         return items
 
-    def _pick_best_candidate(self, candidates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
-        if not candidates:
-            return None
-
-        def rank(item: Dict[str, Any]) -> Tuple[int, float, int]:
-            status_order = {"fail": 3, "pass": 2, "needs_review": 1}
-            return (
-                status_order.get(str(item.get("status") or "needs_review"), 1),
-                self._to_confidence(item.get("confidence")),
-                len(str(item.get("evidence_text") or "").strip()),
-            )
-
-        return sorted(candidates, key=rank, reverse=True)[0]
+    def _candidate_rank(self, item: Dict[str, Any]) -> Tuple[int, float, int]:
+        return (
+            _STATUS_ORDER.get(str(item.get("status") or "needs_review"), 1),
+            self._to_confidence(item.get("confidence")),
+            len(str(item.get("evidence_text") or "").strip()),
+        )
 
     def _to_confidence(self, value: Any) -> float:
         try:
@@ -378,22 +409,17 @@ class MultimodalAuditService:
         }
 
     def _pick_best_chunk(self, query_text: str, chunks: List[Any]):
-        best_chunk = chunks[0]
-        best_score = self._text_overlap_score(query_text, chunks[0].content)
-        for chunk in chunks[1:]:
-            score = self._text_overlap_score(query_text, chunk.content)
-            if score > best_score:
-                best_score = score
-                best_chunk = chunk
-        return best_chunk
-
-    def _text_overlap_score(self, lhs: str, rhs: str) -> float:
-        left_tokens = set(re.findall(r"[\u4e00-\u9fff]+|[A-Za-z0-9]+", lhs or ""))
-        right_tokens = set(re.findall(r"[\u4e00-\u9fff]+|[A-Za-z0-9]+", rhs or ""))
-        if not left_tokens or not right_tokens:
-            return 0.0
-        inter = left_tokens & right_tokens
-        return len(inter) / len(left_tokens)
+        # Tokenize the query once; only the chunk side changes between candidates.
+        query_tokens = self._overlap_tokens(query_text)
+        if not query_tokens:
+            return chunks[0]
+        return max(
+            chunks,
+            key=lambda chunk: len(query_tokens & self._overlap_tokens(chunk.content)) / len(query_tokens),
+        )
+
+    def _overlap_tokens(self, text: str) -> set[str]:
+        return set(_OVERLAP_TOKEN_RE.findall(text or ""))
 
     def _build_fallback_bbox(self, *, page: int, width: float, height: float) -> BoundingBox:
         return BoundingBox(
@@ -1,117 +1,544 @@
 """
 RAG engine built on top of ChromaDB for indexing and retrieval.
 """
+import asyncio
+import base64
+from collections import OrderedDict
 import chromadb
 from chromadb.config import Settings
+import functools
 import hashlib
 import logging
+import operator
 import os
 import re
 import json
-from typing import List, Optional
+import struct
+import threading
+from typing import Dict, List, Optional, Tuple
 import httpx
+import numpy as np
 
 
 from app.models.schemas import TextChunk, PageContent, BoundingBox
 
 logger = logging.getLogger(__name__)
 
+_STOPWORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stopwords-zh.txt")
+# BM25 tokens must contain at least one word character; drops punctuation-only tokens.
+_WORD_CHAR_RE = re.compile(r"\w")
+
+
+def _load_stopwords(path: str) -> frozenset:
+    """Load the whitespace-separated Chinese stopword list shipped next to this module."""
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return frozenset(fh.read().split())
+    except OSError as exc:
+        logger.warning("Stopword list unavailable (%s); BM25 runs without stopword filtering.", exc)
+        return frozenset()
+
+
+STOPWORDS = _load_stopwords(_STOPWORDS_PATH)
+
+ZHIPU_EMBEDDINGS_URL = "https://open.bigmodel.cn/api/paas/v4/embeddings"
+_BBOX_FIELDS = operator.attrgetter("x", "y", "w", "h")
+
+
+@functools.lru_cache(maxsize=1024)
+def _line_match_tokens(query: str) -> tuple:
+    """Meaningful query tokens for line highlighting (works even when jieba is unavailable).
+
+    Cached because retrieve() scores every hit against the same query.
+    """
+    return tuple(_TOKEN_RE.findall(query)) or (query,)
+
+
+def _pack_bbox_lines(boxes: List[tuple]) -> str:
+    """Pack per-line (x, y, w, h) boxes as base64 little-endian float32 (Chroma metadata must be str)."""
+    flat = [v for box in boxes for v in box]
+    return base64.b64encode(struct.pack(f"<{len(flat)}f", *flat)).decode("ascii")
+
+
+def _unpack_bbox_lines(raw) -> List[Optional[tuple]]:
+    """Decode bbox_lines metadata; older chunks stored a JSON list of {x, y, w, h} dicts."""
+    if not raw or not isinstance(raw, str):
+        return []
+    try:
+        if raw.startswith("["):
+            return [
+                tuple(float(b[k]) for k in ("x", "y", "w", "h"))
+                if isinstance(b, dict) and all(k in b for k in ("x", "y", "w", "h")) else None
+                for b in json.loads(raw)
+            ]
+        buf = base64.b64decode(raw)
+        values = struct.unpack(f"<{len(buf) // 4}f", buf)
+    except (ValueError, TypeError, struct.error):
+        return []
+    return [values[i:i + 4] for i in range(0, len(values) - 3, 4)]
+
+# One collection per embedding-3 output size: "<prefix>_<dim>". HNSW build parameters are fixed when
+# a collection is created, so changing M / construction_ef only takes effect with a new prefix or
+# dimension (and re-indexing). Rough hnsw:M guide: 16 for small stores, 32 medium, 48 for large ones.
+COLLECTION_PREFIX = "documents_v4"
+# Collection used before the per-dimension "<prefix>_<dim>" naming (2048-dim embedding-3).
+LEGACY_COLLECTION_NAME = "documents_v3"
+_HNSW_METADATA = {
+    "hnsw:space": "cosine",
+    # graph degree; Chroma's default of 16 loses recall at high dims
+    "hnsw:M": int(os.getenv("CHROMA_HNSW_M", "32") or "32"),
+    "hnsw:construction_ef": int(os.getenv("CHROMA_HNSW_CONSTRUCTION_EF", "200") or "200"),
+    # default 10 is too small for n_results in the hundreds
+    "hnsw:search_ef": int(os.getenv("CHROMA_HNSW_SEARCH_EF", "64") or "64"),
+    "hnsw:batch_size": int(os.getenv("CHROMA_HNSW_BATCH_SIZE", "256") or "256"),
+    "hnsw:sync_threshold": int(os.getenv("CHROMA_HNSW_SYNC_THRESHOLD", "2000") or "2000"),
+}
+# Bump when tokenization (jieba mode, stopwords) changes so stale BM25 snapshots are rebuilt.
+_BM25_SNAPSHOT_VERSION = 1
+# Distinct queries whose tokenization each engine keeps.
+_QUERY_TOKEN_CACHE_SIZE = 4096
+
+
+def embedding_dimensions() -> int:
+    """embedding-3 output size from EMBEDDING_DIMENSIONS (default 1024)."""
+    return int(os.getenv("EMBEDDING_DIMENSIONS", "1024") or "1024")
+
+
+def collection_name() -> str:
+    """Name of the active vector collection for the configured embedding size."""
+    return f"{COLLECTION_PREFIX}_{embedding_dimensions()}"
+
+
+def _as_unit_vectors(embeddings) -> np.ndarray:
+    """Stack embeddings into a contiguous float32 (N, dim) array with unit L2 norm."""
+    arr = np.array(embeddings, dtype=np.float32, ndmin=2)
+    arr /= np.linalg.norm(arr, axis=1, keepdims=True).clip(min=1e-12)
+    return arr
+
+
+# Chunk boundary separators in order of preference (paragraph break first, comma last).
+_CHUNK_SEPARATORS = ("\n\n", "。", ".", "\n", "；", ";", "，", ",")
+# A run of 2+ newlines is one paragraph break, ending where the last "\n\n" pair ends.
+_CHUNK_SPLIT_RE = re.compile(r"\n\n+|[。.\n；;，,]")
+
+# OCR-noise / dedup / highlight patterns, compiled once (these run per OCR line and per hit).
+_WS_RE = re.compile(r"\s+")
+_CJK_RE = re.compile(r"[\u4e00-\u9fff]")
+_PUNCT_RE = re.compile(r"[\W_]+", re.UNICODE)
+_ASCII_SHORT_RE = re.compile(r"[A-Za-z]{1,4}")
+_ASCII_NUM_RE = re.compile(r"\d{1,2}")
+_ASCII_YEARISH_RE = re.compile(r"\d{3,4}")
+_DEDUP_STRIP_RE = re.compile(r"[^\w\u4e00-\u9fff ]+")
+_TOKEN_RE = re.compile(r"[\u4e00-\u9fff]{2,}|[A-Za-z]{2,}|\d{2,}")
+
+try:
+    import bm25s
+    HAS_BM25S = True
+except ImportError:
+    HAS_BM25S = False
+
 try:
-    from rank_bm25 import BM25Okapi
     import jieba
+    if not HAS_BM25S:
+        from rank_bm25 import BM25Okapi
     HAS_BM25 = True
 except ImportError:
     HAS_BM25 = False
-    print("Warning: rank_bm25 or jieba not found. Hybrid search disabled.")
+    logger.warning("bm25s/rank_bm25 or jieba not found. Hybrid search disabled.")
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import h2  # noqa: F401  -- httpx only negotiates HTTP/2 when the h2 package is installed
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
 
 try:
     from sentence_transformers import CrossEncoder as _CrossEncoder
     _reranker = None
+    # The model may be loaded by the startup preload thread and a first query at the same time.
+    _reranker_lock = threading.Lock()
 
     def _get_reranker():
         global _reranker
         if _reranker is None:
-            print("[Reranker] Loading BAAI/bge-reranker-base ...", flush=True)
-            _reranker = _CrossEncoder("BAAI/bge-reranker-base", max_length=512)
-            print("[Reranker] Model loaded.", flush=True)
+            with _reranker_lock:
+                if _reranker is None:
+                    logger.info("[Reranker] Loading BAAI/bge-reranker-base ...")
+                    _reranker = _CrossEncoder("BAAI/bge-reranker-base", max_length=512)
+                    logger.info("[Reranker] Model loaded.")
         return _reranker
 
     HAS_RERANKER = True
 except ImportError:
     HAS_RERANKER = False
-    print("Warning: sentence-transformers not found. Cross-encoder reranking disabled.")
+    logger.warning("sentence-transformers not found. Cross-encoder reranking disabled.")
+
+
+@functools.lru_cache(maxsize=None)
+def _get_chroma_client(path: str):
+    """One PersistentClient per store directory, so extra RAGEngine instances share its segments."""
+    return chromadb.PersistentClient(
+        path=path,
+        settings=Settings(anonymized_telemetry=False)
+    )
 
 
 class RAGEngine:
     """Index, retrieve, and locate references for document QA."""
     
     def __init__(self, persist_directory: str = "./chroma_db"):
-        self.client = chromadb.PersistentClient(
-            path=persist_directory,
-            settings=Settings(anonymized_telemetry=False)
-        )
+        self.client = _get_chroma_client(os.path.abspath(persist_directory))
+        # embedding-3 supports 256/512/1024/2048 output dims; 1024 halves vector memory and HNSW
+        # distance cost versus 2048 with little retrieval loss.
+        self.embedding_dim = embedding_dimensions()
         self.collection = self.client.get_or_create_collection(
-            name="documents_v3",  # Keep a dedicated collection for 2048-dim embedding-3 vectors.
-            metadata={"hnsw:space": "cosine"}
+            name=collection_name(),
+            metadata=_HNSW_METADATA,
+            # Vectors always come from embedding-3 (or the hash fallback); never let Chroma
+            # instantiate its bundled ONNX MiniLM model for adds or queries.
+            embedding_function=None,
         )
+        existing = self.collection.metadata or {}
+        stale = {key: existing.get(key) for key, value in _HNSW_METADATA.items() if existing.get(key) != value}
+        if stale:
+            logger.warning(
+                "Collection %s was created with different HNSW settings %s; "
+                "the CHROMA_HNSW_* values only apply to new collections.",
+                self.collection.name, stale,
+            )
+
+        # Chroma rejects adds above client.get_max_batch_size(); large documents are written in
+        # slices so no single add hits that limit or holds a worker thread for the whole document.
+        self.chroma_add_batch_size = max(1, min(
+            int(os.getenv("CHROMA_ADD_BATCH_SIZE", "500") or "500"),
+            self.client.get_max_batch_size(),
+        ))
+        self.chroma_add_concurrency = max(1, int(os.getenv("CHROMA_ADD_CONCURRENCY", "1") or "1"))
 
         self.zhipu_api_key = os.getenv("ZHIPU_API_KEY", "")
-        self.bm25_cache = {} # Cache for BM25 indices: {doc_id: {'model': bm25, 'ids': [], 'texts': []}}
+        self._http: Optional[httpx.AsyncClient] = None
+        # Upper bound on in-flight embedding requests, shared by all indexing jobs (provider rate limits).
+        self.embedding_concurrency = max(1, int(os.getenv("EMBEDDING_CONCURRENCY", "8") or "8"))
+        self._embed_semaphore = asyncio.Semaphore(self.embedding_concurrency)
+        # API embeddings of recently indexed texts, keyed by a 16-byte blake2b digest of the text.
+        # OCR pages are indexed one call at a time, so per-call dedup alone misses repeated
+        # headers/footers across pages. Stored as float32 arrays (~4 KB each at 1024 dims).
+        self.embedding_cache_size = max(0, int(os.getenv("EMBEDDING_CACHE_SIZE", "2048") or "2048"))
+        self._embedding_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self.enable_bm25 = HAS_BM25 and os.getenv("RAG_ENABLE_BM25", "1").strip().lower() in {"1", "true", "yes", "y"}
+        # Skip BM25 when the best vector hit is at least this close (cosine distance); 0 disables the shortcut.
+        self.vector_only_distance = float(os.getenv("RAG_VECTOR_ONLY_DISTANCE", "0.3") or "0.3")
+        # Load the cross-encoder at startup (in the background) instead of on the first query.
+        self.preload_reranker = HAS_RERANKER and os.getenv("RAG_PRELOAD_RERANKER", "1").strip().lower() in {"1", "true", "yes", "y"}
+        self._reranker_preload: Optional[asyncio.Task] = None
+        self._legacy_migration: Optional[asyncio.Task] = None
+        # Tokenized BM25 corpora are snapshotted here so a restart skips the Chroma scan + jieba pass.
+        # Scoped by collection: chunk ids and texts belong to one embedding dimension / prefix.
+        self.bm25_snapshot_dir = os.path.join(persist_directory, "bm25", self.collection.name)
+        self.bm25_cache = {} # Cache for BM25 indices: {doc_id: {'model': bm25, 'ids': [], 'texts': [], 'metadatas': []}}
+        # Bumped on every invalidation; a build only publishes its entry (and snapshot) when the
+        # generation it started from is still current, so a build that raced a write is dropped.
+        self._bm25_generation: Dict[str, int] = {}
+        # Engine-local tokenizer so BM25 work does not share jieba's module-level default instance.
+        self._jieba = jieba.Tokenizer() if HAS_BM25 else None
+        if self._jieba is not None:
+            # Load the jieba dictionary up front so the first query does not pay for it.
+            self._jieba.initialize()
+        # Per-engine LRU of query tokenizations; repeated questions skip the jieba pass.
+        self._query_token_cache: "OrderedDict[str, tuple]" = OrderedDict()
     
-    async def _get_embeddings(self, texts: List[str], api_key: Optional[str] = None) -> List[List[float]]:
-        """Fetch embeddings, preferring the Zhipu API when available."""
+    # ChromaDB calls are synchronous SQLite/HNSW work; run them in a worker thread so
+    # large adds/queries do not stall the event loop.
+    async def _chroma_add(self, **kwargs):
+        return await asyncio.to_thread(self.collection.add, **kwargs)
+
+    async def _chroma_add_batched(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[dict]):
+        """Add chunks in slices of chroma_add_batch_size, at most chroma_add_concurrency at a time."""
+        size = self.chroma_add_batch_size
+        if len(ids) <= size:
+            await self._chroma_add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+            return
+
+        semaphore = asyncio.Semaphore(self.chroma_add_concurrency)
+
+        async def add_slice(start: int):
+            end = start + size
+            async with semaphore:
+                await self._chroma_add(
+                    ids=ids[start:end],
+                    embeddings=embeddings[start:end],
+                    documents=documents[start:end],
+                    metadatas=metadatas[start:end],
+                )
+
+        await asyncio.gather(*(add_slice(start) for start in range(0, len(ids), size)))
+
+    async def _chroma_query(self, **kwargs):
+        return await asyncio.to_thread(self.collection.query, **kwargs)
+
+    async def _chroma_get(self, **kwargs):
+        return await asyncio.to_thread(self.collection.get, **kwargs)
+
+    async def _chroma_delete(self, **kwargs):
+        return await asyncio.to_thread(self.collection.delete, **kwargs)
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Shared keep-alive client for embedding calls, created on first use."""
+        if self._http is None or self._http.is_closed:
+            pool = self.embedding_concurrency * 2
+            self._http = httpx.AsyncClient(
+                http2=HAS_HTTP2,
+                timeout=30.0,
+                limits=httpx.Limits(max_connections=pool, max_keepalive_connections=pool),
+            )
+        return self._http
+
+    async def warm_up(self):
+        """Load lazily initialised state before the first user request.
+
+        The Chroma HNSW segment is loaded by one tiny query. The cross-encoder may need a
+        download, so it loads in the background without holding up startup.
+        """
+        if self.preload_reranker and self._reranker_preload is None:
+            self._reranker_preload = asyncio.create_task(self._preload_reranker())
+        if await asyncio.to_thread(self.collection.count) == 0:
+            return
+        await self._chroma_query(
+            query_embeddings=_as_unit_vectors([self._simple_hash_embedding("warm-up")]),
+            n_results=1,
+            include=[],
+        )
+
+    async def _preload_reranker(self):
+        try:
+            await asyncio.to_thread(_get_reranker)
+        except Exception as e:
+            logger.warning("[Reranker] Preload failed: %s", e)
+
+    def start_legacy_migration(self, doc_ids: List[str]) -> None:
+        """Re-index, in the background, documents that only have chunks in an older collection."""
+        if doc_ids and self._legacy_migration is None:
+            self._legacy_migration = asyncio.create_task(self._migrate_legacy_documents(list(doc_ids)))
+
+    def _legacy_collections(self) -> list:
+        names = []
+        for item in self.client.list_collections():
+            name = getattr(item, "name", item)
+            if name == self.collection.name:
+                continue
+            if name == LEGACY_COLLECTION_NAME or name.startswith(f"{COLLECTION_PREFIX}_"):
+                names.append(name)
+        return [self.client.get_collection(name, embedding_function=None) for name in names]
+
+    async def _migrate_legacy_documents(self, doc_ids: List[str]):
+        """Copy chunks of documents missing from the active collection out of older collections.
+
+        Vectors from another collection have the wrong dimension, so texts and metadata are
+        copied and re-embedded with the current settings. Hash-fallback vectors would be stored
+        for good, so this needs ZHIPU_API_KEY and embeds strictly; a document that fails keeps
+        no rows in the active collection and is retried on the next start.
+        """
+        try:
+            missing = []
+            for doc_id in doc_ids:
+                found = await self._chroma_get(where={"doc_id": doc_id}, limit=1, include=[])
+                if not found["ids"]:
+                    missing.append(doc_id)
+            if not missing:
+                return
+            logger.warning(
+                "[RAG] %d document(s) have no chunks in collection %s and cannot be retrieved until "
+                "re-indexed: %s. Migrating them from older collections in the background.",
+                len(missing), self.collection.name, ", ".join(missing),
+            )
+            if not self.zhipu_api_key:
+                logger.warning(
+                    "[RAG] ZHIPU_API_KEY is not set, so legacy chunks cannot be re-embedded; skipping "
+                    "the migration. Set it in backend/.env and restart to migrate these documents."
+                )
+                return
+
+            legacy = await asyncio.to_thread(self._legacy_collections)
+            unmigrated = []
+            for doc_id in missing:
+                for source in legacy:
+                    rows = await asyncio.to_thread(
+                        source.get, where={"doc_id": doc_id}, include=["documents", "metadatas"]
+                    )
+                    if rows["ids"]:
+                        break
+                else:
+                    unmigrated.append(doc_id)
+                    continue
+
+                metadatas = [
+                    {**meta, **{key: float(meta[key]) for key in ("bbox_x", "bbox_y", "bbox_w", "bbox_h") if key in meta}}
+                    for meta in rows["metadatas"]
+                ]
+                try:
+                    embeddings = await self._get_unique_embeddings(rows["documents"], strict=True)
+                    await self._chroma_add_batched(
+                        ids=rows["ids"],
+                        embeddings=_as_unit_vectors(embeddings),
+                        documents=rows["documents"],
+                        metadatas=metadatas,
+                    )
+                except Exception as e:
+                    # Drop any slices already written so the document still counts as missing.
+                    await self._chroma_delete(where={"doc_id": doc_id})
+                    logger.warning("[RAG] Could not migrate %s; will retry on next start: %s", doc_id, e)
+                    continue
+                finally:
+                    self._invalidate_bm25_cache(doc_id)
+                logger.info("[RAG] Migrated %d chunks of %s from %s", len(rows["ids"]), doc_id, source.name)
+
+            if unmigrated:
+                logger.warning(
+                    "[RAG] No older collection holds chunks for %d document(s); delete and re-upload "
+                    "them to make them searchable: %s",
+                    len(unmigrated), ", ".join(unmigrated),
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("[RAG] Legacy collection migration failed: %s", e)
+
+    async def close(self):
+        """Release pooled embedding connections (called from the app shutdown hook)."""
+        if self._legacy_migration is not None and not self._legacy_migration.done():
+            self._legacy_migration.cancel()
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _embed_batch(self, batch: List[str], api_key: str) -> List[List[float]]:
+        """POST one batch to the Zhipu embedding endpoint."""
+        response = await self._get_http_client().post(
+            ZHIPU_EMBEDDINGS_URL,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": "embedding-3",
+                "input": batch,
+                "dimensions": self.embedding_dim
+            }
+        )
+        response.raise_for_status()
+        # Embedding payloads are large float arrays; orjson parses them several times faster.
+        result = orjson.loads(response.content) if HAS_ORJSON else response.json()
+        # Slice defensively so every stored/query vector matches the collection dimension.
+        return [item["embedding"][:self.embedding_dim] for item in result["data"]]
+
+    async def _get_embeddings(
+        self, texts: List[str], api_key: Optional[str] = None, strict: bool = False
+    ) -> List[List[float]]:
+        """Fetch embeddings, preferring the Zhipu API when available.
+
+        strict=True raises instead of falling back to hash embeddings (no key or API error).
+        """
         final_api_key = api_key or self.zhipu_api_key
         
         if not final_api_key:
+            if strict:
+                raise RuntimeError("no embedding API key configured")
             # Fall back to a deterministic hash embedding for tests or local-only use.
             return [self._simple_hash_embedding(text) for text in texts]
         
-        headers = {
-            "Authorization": f"Bearer {final_api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        embeddings = []
-        
-        # Batch requests to reduce API overhead.
-        for i in range(0, len(texts), 10):
-            batch = texts[i:i+10]
-            
-            try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.post(
-                        "https://open.bigmodel.cn/api/paas/v4/embeddings",
-                        headers=headers,
-                        json={
-                            "model": "embedding-3",
-                            "input": batch
-                        }
-                    )
-                    response.raise_for_status()
-                    result = response.json()
-                    
-                    for item in result["data"]:
-                        embeddings.append(item["embedding"])
-            except Exception as e:
-                print(f"Embedding generation failed: {e}")
-                import traceback
-                traceback.print_exc()
-                # Fallback to hash embedding on error
-                for text in batch:
-                    embeddings.append(self._simple_hash_embedding(text))
-        
-        return embeddings
+        async def fetch(batch: List[str]) -> List[List[float]]:
+            async with self._embed_semaphore:
+                try:
+                    embeddings = await self._embed_batch(batch, final_api_key)
+                    self._remember_embeddings(batch, embeddings)
+                    return embeddings
+                except Exception as e:
+                    if strict:
+                        raise
+                    logger.exception("Embedding generation failed: %s", e)
+                    # Fallback to hash embedding on error
+                    return [self._simple_hash_embedding(text) for text in batch]
+
+        # Batch requests to reduce API overhead and keep several batches in flight;
+        # gather() returns results in submission order, so the output stays aligned with texts.
+        batches = await asyncio.gather(*(fetch(texts[i:i+10]) for i in range(0, len(texts), 10)))
+        return [embedding for batch in batches for embedding in batch]
+
+    @staticmethod
+    def _embedding_key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def _remember_embeddings(self, texts: List[str], embeddings: List[List[float]]) -> None:
+        """Cache API embeddings (never hash fallbacks, so a transient API error is not sticky)."""
+        if not self.embedding_cache_size:
+            return
+        cache = self._embedding_cache
+        for text, embedding in zip(texts, embeddings):
+            key = self._embedding_key(text)
+            cache[key] = np.asarray(embedding, dtype=np.float32)
+            cache.move_to_end(key)
+        while len(cache) > self.embedding_cache_size:
+            cache.popitem(last=False)
+
+    async def _get_unique_embeddings(
+        self, texts: List[str], api_key: Optional[str] = None, strict: bool = False
+    ) -> list:
+        """Embed each distinct, not recently embedded text once (OCR repeats headers, footers,
+        table cells) and scatter the vectors back in input order."""
+        if not (api_key or self.zhipu_api_key):
+            # Hash embeddings are local and cheap; only collapse in-call duplicates.
+            slot_by_text = {}
+            for text in texts:
+                slot_by_text.setdefault(text, len(slot_by_text))
+            unique_embeddings = await self._get_embeddings(list(slot_by_text), api_key, strict)
+            return [unique_embeddings[slot_by_text[text]] for text in texts]
+
+        cache = self._embedding_cache
+        keys = [self._embedding_key(text) for text in texts]
+        # Take cache hits before awaiting: concurrent indexing jobs may evict entries meanwhile.
+        hits = {}
+        slot_by_key = {}
+        pending = []
+        for key, text in zip(keys, texts):
+            if key in hits or key in slot_by_key:
+                continue
+            cached = cache.get(key)
+            if cached is not None:
+                cache.move_to_end(key)
+                hits[key] = cached
+            else:
+                slot_by_key[key] = len(pending)
+                pending.append(text)
+
+        fresh = await self._get_embeddings(pending, api_key, strict) if pending else []
+        if len(pending) < len(texts):
+            logger.debug("[RAG] Embedding %d of %d chunk texts (rest are duplicates or cached)", len(pending), len(texts))
+        return [hits[key] if key in hits else fresh[slot_by_key[key]] for key in keys]
+
+    async def _get_query_embedding(self, query: str, api_key: Optional[str] = None) -> List[float]:
+        """Embed a single query without going through the batching loop."""
+        final_api_key = api_key or self.zhipu_api_key
+        if not final_api_key:
+            return self._simple_hash_embedding(query)
+        try:
+            return (await self._embed_batch([query], final_api_key))[0]
+        except Exception as e:
+            logger.exception("Query embedding failed: %s", e)
+            return self._simple_hash_embedding(query)
     
-    def _simple_hash_embedding(self, text: str, dim: int = 2048) -> List[float]:
+    def _simple_hash_embedding(self, text: str, dim: Optional[int] = None) -> List[float]:
         """Generate a simple deterministic embedding when no API key is available."""
-        import hashlib
-        hash_bytes = hashlib.sha256(text.encode()).digest()
-        # Repeat the hash bytes until we reach the requested dimension.
-        embedding = []
-        for i in range(dim):
-            byte_idx = i % len(hash_bytes)
-            embedding.append((hash_bytes[byte_idx] - 128) / 128.0)
-        return embedding
+        dim = dim or self.embedding_dim
+        hash_bytes = np.frombuffer(hashlib.sha256(text.encode()).digest(), dtype=np.uint8)
+        # Repeat the hash bytes until we reach the requested dimension; (b - 128) / 128 is exact in float32.
+        embedding = (np.resize(hash_bytes, dim).astype(np.int16) - 128).astype(np.float32) / 128.0
+        return embedding.tolist()
 
     def _is_low_value_text(self, text: str) -> bool:
         """
@@ -123,13 +550,12 @@ class RAGEngine:
         if not t:
             return True
 
-        compact = re.sub(r"\s+", "", t)
-        has_cjk = any("\u4e00" <= c <= "\u9fff" for c in compact)
-        if re.fullmatch(r"[\W_]+", compact, flags=re.UNICODE):
+        compact = _WS_RE.sub("", t)
+        if _PUNCT_RE.fullmatch(compact):
             return True
 
-        if has_cjk:
-            cjk_count = sum(1 for c in compact if "\u4e00" <= c <= "\u9fff")
+        if _CJK_RE.search(compact):
+            cjk_count = len(_CJK_RE.findall(compact))
             has_ascii_alnum = any(c.isascii() and c.isalnum() for c in compact)
             has_digits = any(c.isdigit() for c in compact)
 
@@ -142,11 +568,11 @@ class RAGEngine:
 
         if compact.isascii():
             # Drop short ASCII-only words/numbers (common OCR artifacts).
-            if re.fullmatch(r"[A-Za-z]{1,4}", compact):
+            if _ASCII_SHORT_RE.fullmatch(compact):
                 return True
-            if re.fullmatch(r"\d{1,2}", compact):
+            if _ASCII_NUM_RE.fullmatch(compact):
                 return True
-            if len(compact) <= 4 and not re.fullmatch(r"\d{3,4}", compact):
+            if len(compact) <= 4 and not _ASCII_YEARISH_RE.fullmatch(compact):
                 return True
 
         return False
@@ -155,8 +581,8 @@ class RAGEngine:
         t = (text or "").strip().lower()
         if not t:
             return ""
-        t = re.sub(r"\s+", " ", t)
-        t = re.sub(r"[^\w\u4e00-\u9fff ]+", "", t)
+        t = _WS_RE.sub(" ", t)
+        t = _DEDUP_STRIP_RE.sub("", t)
         return t.strip()
 
     def _collect_header_footer_repeat_keys(self, pages: List[PageContent]) -> set:
@@ -200,10 +626,7 @@ class RAGEngine:
         if not q:
             return 0
 
-        # Extract meaningful tokens (works even when jieba is unavailable).
-        tokens = re.findall(r"[\u4e00-\u9fff]{2,}|[A-Za-z]{2,}|\d{2,}", q)
-        if not tokens:
-            tokens = [q]
+        tokens = _line_match_tokens(q)
 
         best_i = 0
         best_score = -1
@@ -211,10 +634,8 @@ class RAGEngine:
             t = (line or "").strip()
             if not t:
                 continue
-            score = 0
-            for tok in tokens:
-                if tok and tok in t:
-                    score += 2
+            # 2 points per query token present in the line (substring test runs in C).
+            score = 2 * sum(map(t.__contains__, tokens))
             # Small bonus for longer informative lines.
             score += min(len(t), 120) / 120.0
             if score > best_score:
@@ -222,6 +643,26 @@ class RAGEngine:
                 best_i = i
         return best_i
     
+    def _normalize_coords(self, coords) -> List[tuple]:
+        """Flatten per-line BoundingBox objects (or plain dicts) into (x, y, w, h) float tuples."""
+        if not coords:
+            return []
+        if all(isinstance(coord, BoundingBox) for coord in coords):
+            # Validated models already hold floats: one C-level attrgetter per line, no per-field casts.
+            return list(map(_BBOX_FIELDS, coords))
+        normalized = []
+        for coord in coords:
+            if isinstance(coord, dict):
+                normalized.append((
+                    float(coord.get("x", 50)),
+                    float(coord.get("y", 50)),
+                    float(coord.get("w", 400)),
+                    float(coord.get("h", 30)),
+                ))
+            else:
+                normalized.append((float(coord.x), float(coord.y), float(coord.w), float(coord.h)))
+        return normalized
+
     def _chunk_text(self, text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
         """Split long text into overlapping chunks near sentence boundaries."""
         if len(text) <= chunk_size:
@@ -229,17 +670,26 @@ class RAGEngine:
         
         chunks = []
         start = 0
+        text_len = len(text)
+        search_offset = chunk_size // 2 + 1
         
-        while start < len(text):
+        while start < text_len:
             end = start + chunk_size
             
             # Prefer sentence boundaries to reduce semantic breaks.
-            if end < len(text):
-                # Look for the nearest punctuation mark or line break.
-                for sep in ["\n\n", "。", ".", "\n", "；", ";", "，", ","]:
-                    last_sep = text[start:end].rfind(sep)
-                    if last_sep > chunk_size // 2:
-                        end = start + last_sep + len(sep)
+            if end < text_len:
+                # One scan over the back half of the window (pos/endpos, no slice) records the
+                # last hit of each separator; then take the most preferred one that was found.
+                last_sep_end = {}
+                for match in _CHUNK_SPLIT_RE.finditer(text, start + search_offset, end):
+                    sep = match.group()
+                    if len(sep) > 1:
+                        last_sep_end["\n\n"] = match.end()
+                        sep = "\n"
+                    last_sep_end[sep] = match.end()
+                for sep in _CHUNK_SEPARATORS:
+                    if sep in last_sep_end:
+                        end = last_sep_end[sep]
                         break
             
             chunk = text[start:end].strip()
@@ -269,15 +719,19 @@ class RAGEngine:
             if not page.text:
                 continue
                 
+            base_meta = {"doc_id": doc_id, "page": page.page_number, "source": page.type}
+
             # When coordinates are available, preserve them for precise highlighting.
-            has_coords = page.coordinates and len(page.coordinates) > 0
-            
-            if has_coords:
+            coords = self._normalize_coords(page.coordinates)
+
+            if coords:
                 # Build chunks line by line when we have reliable coordinates.
                 text_lines = page.text.split('\n')
                 # Build (text, bbox) entries first (skip OCR noise), then merge consecutive
                 # lines into slightly larger chunks for better retrieval quality.
                 entries = []
+                n_coords = len(coords)
+                n_lines = max(len(text_lines), 1)
                 for idx, text in enumerate(text_lines):
                     text = text.strip()
                     if not text or self._is_low_value_text(text):
@@ -286,50 +740,46 @@ class RAGEngine:
                     if line_key and line_key in header_footer_repeat_keys:
                         continue
 
-                    # 璇诲彇褰撳墠琛屽潗鏍囥€?
-                    if idx < len(page.coordinates):
-                        coord = page.coordinates[idx]
-                        bbox_x = coord.x if hasattr(coord, 'x') else coord.get('x', 50)
-                        bbox_y = coord.y if hasattr(coord, 'y') else coord.get('y', 50)
-                        bbox_w = coord.w if hasattr(coord, 'w') else coord.get('w', 400)
-                        bbox_h = coord.h if hasattr(coord, 'h') else coord.get('h', 30)
+                    # 读取当前行坐标。
+                    if idx < n_coords:
+                        bbox_x, bbox_y, bbox_w, bbox_h = coords[idx]
                     else:
-                        # 鍧愭爣缂哄け鏃朵娇鐢ㄤ及绠楀€笺€?
-                        bbox_x = 50
-                        bbox_y = (1.0 - idx / max(len(text_lines), 1)) * 700
-                        bbox_w = 500
-                        bbox_h = 30
+                        # 坐标缺失时使用估算值。
+                        bbox_x = 50.0
+                        bbox_y = (1.0 - idx / n_lines) * 700
+                        bbox_w = 500.0
+                        bbox_h = 30.0
 
-                    entries.append((text, float(bbox_x), float(bbox_y), float(bbox_w), float(bbox_h)))
+                    entries.append((text, bbox_x, bbox_y, bbox_w, bbox_h))
 
                 coord_chunk_chars = 320
                 coord_chunk_max_lines = 8
 
                 current_texts = []
-                current_bbox = None  # (x0, y0, x1, y1)
-                current_line_bboxes = []  # list of per-line bbox dicts in the same order as current_texts
+                current_len = 0  # len("\n".join(current_texts)), kept incrementally
+                current_line_bboxes = []  # per-line (x, y, w, h) in the same order as current_texts
+
+                def reset_current():
+                    nonlocal current_texts, current_len, current_line_bboxes
+                    current_texts = []
+                    current_len = 0
+                    current_line_bboxes = []
 
                 def flush_current():
-                    nonlocal global_chunk_count, current_texts, current_bbox, current_line_bboxes
-                    if not current_texts or not current_bbox:
-                        current_texts = []
-                        current_bbox = None
-                        current_line_bboxes = []
+                    nonlocal global_chunk_count
+                    if not current_texts or not current_line_bboxes:
+                        reset_current()
                         return
 
                     chunk_text = "\n".join(current_texts).strip()
                     if not chunk_text or self._is_low_value_text(chunk_text):
-                        current_texts = []
-                        current_bbox = None
-                        current_line_bboxes = []
+                        reset_current()
                         return
 
                     dedup_key = self._normalize_for_dedup(chunk_text)
                     if dedup_key and len(dedup_key) >= 80:
                         if dedup_key in seen_cross_page_chunks:
-                            current_texts = []
-                            current_bbox = None
-                            current_line_bboxes = []
+                            reset_current()
                             return
                         seen_cross_page_chunks.add(dedup_key)
 
@@ -337,53 +787,38 @@ class RAGEngine:
                     block_id = f"b{global_chunk_count:04d}"  # b0001, b0002...
                     chunk_id = f"{doc_id}_{block_id}"  # Unique ID for Chroma
 
-                    x0, y0, x1, y1 = current_bbox
+                    # Union of the line boxes, reduced once per chunk instead of per appended line.
+                    xs, ys, ws, hs = zip(*current_line_bboxes)
+                    x0 = min(xs)
+                    y0 = min(ys)
+                    x1 = max(map(operator.add, xs, ws))
+                    y1 = max(map(operator.add, ys, hs))
                     all_chunks.append(chunk_text)
                     all_ids.append(chunk_id)
                     all_metadatas.append({
-                        "doc_id": doc_id,
-                        "page": page.page_number,
-                        "source": page.type,
+                        **base_meta,
                         "block_id": block_id,
                         "bbox_x": float(x0),
                         "bbox_y": float(y0),
                         "bbox_w": float(x1 - x0),
                         "bbox_h": float(y1 - y0),
                         # Store per-line boxes so we can return a tighter highlight bbox later.
-                        "bbox_lines": json.dumps(current_line_bboxes, ensure_ascii=False),
+                        "bbox_lines": _pack_bbox_lines(current_line_bboxes),
                     })
 
-                    current_texts = []
-                    current_bbox = None
-                    current_line_bboxes = []
+                    reset_current()
 
                 for text, bbox_x, bbox_y, bbox_w, bbox_h in entries:
-                    x0 = bbox_x
-                    y0 = bbox_y
-                    x1 = bbox_x + bbox_w
-                    y1 = bbox_y + bbox_h
-
-                    if not current_texts:
-                        current_texts = [text]
-                        current_bbox = (x0, y0, x1, y1)
-                        current_line_bboxes = [{"x": x0, "y": y0, "w": bbox_w, "h": bbox_h}]
-                        continue
-
                     # Approx length with newlines.
-                    current_len = sum(len(t) for t in current_texts) + max(len(current_texts) - 1, 0)
-                    next_len = current_len + 1 + len(text)
-
-                    if next_len > coord_chunk_chars or len(current_texts) >= coord_chunk_max_lines:
+                    if current_texts and (
+                        current_len + 1 + len(text) > coord_chunk_chars
+                        or len(current_texts) >= coord_chunk_max_lines
+                    ):
                         flush_current()
-                        current_texts = [text]
-                        current_bbox = (x0, y0, x1, y1)
-                        current_line_bboxes = [{"x": x0, "y": y0, "w": bbox_w, "h": bbox_h}]
-                        continue
 
+                    current_len += len(text) + (1 if current_texts else 0)
                     current_texts.append(text)
-                    current_line_bboxes.append({"x": x0, "y": y0, "w": bbox_w, "h": bbox_h})
-                    cx0, cy0, cx1, cy1 = current_bbox
-                    current_bbox = (min(cx0, x0), min(cy0, y0), max(cx1, x1), max(cy1, y1))
+                    current_line_bboxes.append((bbox_x, bbox_y, bbox_w, bbox_h))
 
                 flush_current()
             else:
@@ -407,31 +842,30 @@ class RAGEngine:
                     all_chunks.append(chunk_text)
                     all_ids.append(chunk_id)
                     all_metadatas.append({
-                        "doc_id": doc_id,
-                        "page": page.page_number,
-                        "source": page.type,
+                        **base_meta,
                         "block_id": block_id,
-                        "bbox_x": 50,
+                        "bbox_x": 50.0,
                         "bbox_y": y_ratio * 700,
-                        "bbox_w": 500,
-                        "bbox_h": 50
+                        "bbox_w": 500.0,
+                        "bbox_h": 50.0
                     })
         
         if not all_chunks:
             return 0
         
         # Generate embeddings for all chunks.
-        embeddings = await self._get_embeddings(all_chunks, api_key)
+        embeddings = await self._get_unique_embeddings(all_chunks, api_key)
         
-        # Persist chunks into ChromaDB.
-        self.collection.add(
+        # Persist chunks into ChromaDB (unit-norm float32, matching the cosine space).
+        await self._chroma_add_batched(
             ids=all_ids,
-            embeddings=embeddings,
+            embeddings=_as_unit_vectors(embeddings),
             documents=all_chunks,
             metadatas=all_metadatas
         )
         
-        print(f"[RAG] Indexed {len(all_chunks)} chunks, first bbox: {all_metadatas[0] if all_metadatas else 'N/A'}")
+        logger.info("[RAG] Indexed %d chunks for %s", len(all_chunks), doc_id)
+        logger.debug("[RAG] First chunk metadata: %s", all_metadatas[0])
         
         # Refresh BM25 on the next query after the index changes.
         self._invalidate_bm25_cache(doc_id)
@@ -450,10 +884,11 @@ class RAGEngine:
         all_ids = []
         all_metadatas = []
         
+        page_number = int(page_number)
         for idx, chunk in enumerate(chunks):
             chunk_id = f"{doc_id}_p{page_number}_ocr{idx}"
             text = chunk.get("text", "")
-            bbox = chunk.get("bbox", {})
+            bbox = chunk.get("bbox") or {}
             
             if not text.strip():
                 continue
@@ -464,43 +899,130 @@ class RAGEngine:
                 "doc_id": doc_id,
                 "page": page_number,
                 "source": "ocr",
-                "bbox_x": bbox.get("x", 0),
-                "bbox_y": bbox.get("y", 0),
-                "bbox_w": bbox.get("w", 100),
-                "bbox_h": bbox.get("h", 20)
+                # Native floats: OCR providers may hand back ints or numeric strings, and typed
+                # metadata keeps SQLite rows small and needs no parsing when hits are decoded.
+                "bbox_x": float(bbox.get("x", 0)),
+                "bbox_y": float(bbox.get("y", 0)),
+                "bbox_w": float(bbox.get("w", 100)),
+                "bbox_h": float(bbox.get("h", 20))
             })
         
         if not all_chunks:
             return 0
         
-        embeddings = await self._get_embeddings(all_chunks, api_key)
+        embeddings = await self._get_unique_embeddings(all_chunks, api_key)
         
-        self.collection.add(
+        await self._chroma_add_batched(
             ids=all_ids,
-            embeddings=embeddings,
+            embeddings=_as_unit_vectors(embeddings),
             documents=all_chunks,
             metadatas=all_metadatas
         )
+        self._invalidate_bm25_cache(doc_id)
         
         return len(all_chunks)
-    
 
+    async def delete_page_ocr_chunks(self, doc_id: str, page_number: int):
+        """Delete the OCR chunks of one page (before re-recognition)."""
+        await self._chroma_delete(where={"doc_id": doc_id, "page": page_number, "source": "ocr"})
+        self._invalidate_bm25_cache(doc_id)
+    
 
-    _STOPWORDS = {
-        "的","了","在","是","我","有","和","就","不","人","都","一","一个",
-        "上","也","很","到","说","要","去","你","会","着","没有","看","好",
-        "自己","这","那","与","为","以","及","等","或","但","而","对","从",
-        "中","之","其","所","该","此","于","后","前","下","内","外","间"
-    }
 
     def _tokenize(self, text: str) -> List[str]:
-        """使用 jieba 进行中文分词，并过滤停用词。"""
+        """使用 jieba 进行中文分词，并过滤停用词和纯标点。"""
         if not HAS_BM25:
             return text.split()
-        tokens = list(jieba.cut_for_search(text))
-        return [t for t in tokens if t.strip() and t not in self._STOPWORDS]
+        return [
+            t for t in self._jieba.lcut_for_search(text)
+            if t not in STOPWORDS and _WORD_CHAR_RE.search(t)
+        ]
+
+    def _tokenize_query(self, query: str) -> tuple:
+        """Cached query tokenization; repeated questions skip the jieba pass."""
+        cache = self._query_token_cache
+        tokens = cache.get(query)
+        if tokens is None:
+            tokens = tuple(self._tokenize(query))
+            cache[query] = tokens
+            while len(cache) > _QUERY_TOKEN_CACHE_SIZE:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(query)
+        return tokens
+
+    def _build_bm25_model(self, corpus: List[List[str]]):
+        """Build a BM25 model over a tokenized corpus (CPU-bound; run in a worker thread)."""
+        if not HAS_BM25S:
+            return BM25Okapi(corpus)
+        if not any(corpus):
+            return None
+        # bm25s precomputes per-token scores into a sparse matrix; a query is one sparse lookup.
+        model = bm25s.BM25()
+        model.index(corpus, show_progress=False)
+        return model
+
+    def _bm25_snapshot_path(self, doc_id: str) -> str:
+        return os.path.join(self.bm25_snapshot_dir, f"{doc_id}.json")
+
+    def _load_bm25_snapshot(self, doc_id: str) -> Optional[dict]:
+        """Read a persisted BM25 corpus snapshot; None when missing, unreadable, or from an older version."""
+        try:
+            with open(self._bm25_snapshot_path(doc_id), "rb") as fh:
+                raw = fh.read()
+            snapshot = orjson.loads(raw) if HAS_ORJSON else json.loads(raw)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("[Hybrid] Ignoring unreadable BM25 snapshot for %s: %s", doc_id, e)
+            return None
+        if not isinstance(snapshot, dict) or snapshot.get("version") != _BM25_SNAPSHOT_VERSION:
+            return None
+        return snapshot
+
+    def _save_bm25_snapshot(self, doc_id: str, snapshot: dict) -> None:
+        """Atomically write a BM25 corpus snapshot (tmp file + os.replace)."""
+        path = self._bm25_snapshot_path(doc_id)
+        tmp_path = path + ".tmp"
+        try:
+            os.makedirs(self.bm25_snapshot_dir, exist_ok=True)
+            if HAS_ORJSON:
+                payload = orjson.dumps(snapshot)
+            else:
+                payload = json.dumps(snapshot, ensure_ascii=False).encode("utf-8")
+            with open(tmp_path, "wb") as fh:
+                fh.write(payload)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            logger.warning("[Hybrid] Could not persist BM25 snapshot for %s: %s", doc_id, e)
+
+    def _remove_bm25_snapshot(self, doc_id: str) -> None:
+        try:
+            os.remove(self._bm25_snapshot_path(doc_id))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("[Hybrid] Could not remove BM25 snapshot for %s: %s", doc_id, e)
+
+    def _build_bm25_entry(self, ids: List[str], texts: List[str], metadatas: List[dict]) -> Tuple[dict, List[List[str]]]:
+        """Tokenize a fresh corpus and build its model; returns the cache entry and the tokens."""
+        tokenize = self._tokenize
+        corpus = [tokenize(doc) for doc in texts]
+        entry = {
+            "model": self._build_bm25_model(corpus),
+            "ids": ids,
+            "texts": texts,
+            "metadatas": metadatas
+        }
+        return entry, corpus
 
-    def _ensure_bm25_index(self, doc_id: str):
+    def _bm25_generation_changed(self, doc_id: str, generation: int) -> bool:
+        if self._bm25_generation.get(doc_id, 0) != generation:
+            logger.debug("[Hybrid] Dropping BM25 index for %s built from data changed mid-build", doc_id)
+            return True
+        return False
+
+    async def _ensure_bm25_index(self, doc_id: str):
         """Ensure the BM25 index for the given document is ready."""
         if not HAS_BM25:
             return
@@ -508,49 +1030,132 @@ class RAGEngine:
         if doc_id in self.bm25_cache:
             return
 
-        print(f"[Hybrid] Building BM25 index for {doc_id}...")
-        # 1. Load all chunks for this document from ChromaDB.
+        generation = self._bm25_generation.get(doc_id, 0)
         try:
-            results = self.collection.get(
+            # 0. Reuse the on-disk snapshot from a previous process when one exists.
+            snapshot = await asyncio.to_thread(self._load_bm25_snapshot, doc_id)
+            if snapshot is not None:
+                bm25 = await asyncio.to_thread(self._build_bm25_model, snapshot["tokens"])
+                if self._bm25_generation_changed(doc_id, generation):
+                    return
+                self.bm25_cache[doc_id] = {
+                    "model": bm25,
+                    "ids": snapshot["ids"],
+                    "texts": snapshot["texts"],
+                    "metadatas": snapshot["metadatas"]
+                }
+                logger.debug("[Hybrid] BM25 index loaded from snapshot for %s", doc_id)
+                return
+
+            logger.debug("[Hybrid] Building BM25 index for %s...", doc_id)
+            # 1. Load all chunks for this document from ChromaDB.
+            results = await self._chroma_get(
                 where={"doc_id": doc_id},
-                include=["documents"]
+                include=["documents", "metadatas"]
             )
             
+            if self._bm25_generation_changed(doc_id, generation):
+                return
             if not results or not results["documents"]:
-                print(f"[Hybrid] No documents found for {doc_id}")
+                logger.debug("[Hybrid] No documents found for %s", doc_id)
                 self.bm25_cache[doc_id] = {
                     "model": None,
                     "ids": [],
-                    "texts": []
+                    "texts": [],
+                    "metadatas": []
                 }
                 return
 
             ids = results["ids"]
-            texts = results["documents"]
-            
-            # 2. Tokenize the corpus.
-            tokenized_corpus = [self._tokenize(doc) for doc in texts]
-            
-            # 3. Build the BM25 index.
-            bm25 = BM25Okapi(tokenized_corpus)
-            
-            self.bm25_cache[doc_id] = {
-                "model": bm25,
+
+            # 2-3. Tokenize the corpus and build the BM25 index off the event loop.
+            entry, corpus = await asyncio.to_thread(
+                self._build_bm25_entry, ids, results["documents"], results["metadatas"]
+            )
+            if self._bm25_generation_changed(doc_id, generation):
+                return
+            self.bm25_cache[doc_id] = entry
+            logger.debug("[Hybrid] BM25 index built for %s, chunks: %d", doc_id, len(ids))
+
+            # 4. Snapshot the tokens for the next cold start. A write that lands while the file
+            # is being saved has already run its removal, so remove the stale file again.
+            await asyncio.to_thread(self._save_bm25_snapshot, doc_id, {
+                "version": _BM25_SNAPSHOT_VERSION,
                 "ids": ids,
-                "texts": texts
-            }
-            print(f"[Hybrid] BM25 index built for {doc_id}, chunks: {len(ids)}")
+                "texts": entry["texts"],
+                "metadatas": entry["metadatas"],
+                "tokens": corpus,
+            })
+            if self._bm25_generation_changed(doc_id, generation):
+                await asyncio.to_thread(self._remove_bm25_snapshot, doc_id)
             
         except Exception as e:
-            print(f"[Hybrid] Index build failed: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("[Hybrid] Index build failed: %s", e)
 
     def _invalidate_bm25_cache(self, doc_id: str):
-        """Invalidate the cached BM25 index for a document."""
+        """Invalidate the cached BM25 index (in memory and on disk) for a document."""
+        self._bm25_generation[doc_id] = self._bm25_generation.get(doc_id, 0) + 1
         if doc_id in self.bm25_cache:
             del self.bm25_cache[doc_id]
-            print(f"[Hybrid] Cache invalidated for {doc_id}")
+            logger.debug("[Hybrid] Cache invalidated for %s", doc_id)
+        self._remove_bm25_snapshot(doc_id)
+
+    def _cached_chunk_details(self, doc_id: str, chunk_ids: List[str]) -> Optional[dict]:
+        """
+        Look chunks up in the document's BM25 cache, which holds every chunk's text and metadata.
+
+        Returns {id: (text, metadata)} for the ids that exist, or None when the document is not
+        cached (the caller then falls back to a Chroma get).
+        """
+        cache = self.bm25_cache.get(doc_id)
+        if not cache or not cache["ids"]:
+            return None
+        positions = cache.get("positions")
+        if positions is None:
+            positions = cache["positions"] = {cid: i for i, cid in enumerate(cache["ids"])}
+        texts = cache["texts"]
+        metadatas = cache["metadatas"]
+        return {
+            cid: (texts[positions[cid]], metadatas[positions[cid]])
+            for cid in chunk_ids if cid in positions
+        }
+
+    def _should_run_bm25(self, query: str, vector_results: dict, top_k: int, allowed_pages: Optional[List[int]]) -> bool:
+        """Decide whether the BM25 leg can still change the result."""
+        if not self.enable_bm25 or len(query.strip()) <= 1:
+            return False
+        if allowed_pages is not None or self.vector_only_distance <= 0:
+            # Page-restricted queries filter vector hits later, so a confident top hit proves nothing.
+            return True
+        ids = vector_results["ids"][0] if vector_results["ids"] else []
+        distances = (vector_results.get("distances") or [[]])[0]
+        return not (len(ids) > top_k and distances and distances[0] < self.vector_only_distance)
+
+    def _rrf_fuse(self, rankings: List[List[str]], rrf_k: int = 60, limit: Optional[int] = None) -> List[str]:
+        """
+        Reciprocal Rank Fusion: score(id) = sum over rankings of 1 / (rrf_k + rank + 1).
+
+        Returns ids best-first (at most ``limit``); ties keep first-appearance order.
+        """
+        all_ids = [chunk_id for ranking in rankings for chunk_id in ranking]
+        if not all_ids:
+            return []
+
+        ranks = np.concatenate([np.arange(len(ranking)) for ranking in rankings])
+        weights = 1.0 / (rrf_k + ranks + 1)
+        uniq, first_pos, inverse = np.unique(np.asarray(all_ids), return_index=True, return_inverse=True)
+        scores = np.zeros(uniq.size)
+        np.add.at(scores, inverse.ravel(), weights)
+
+        if limit is not None and limit < scores.size:
+            # Partial selection: keep everything scoring at least the limit-th best (so boundary
+            # ties are resolved by first appearance, not by argpartition), then sort only those.
+            threshold = -np.partition(-scores, limit - 1)[limit - 1]
+            keep = np.flatnonzero(scores >= threshold)
+            order = keep[np.lexsort((first_pos[keep], -scores[keep]))][:limit]
+        else:
+            order = np.lexsort((first_pos, -scores))
+        return uniq[order].tolist()
 
     async def retrieve(
         self,
@@ -569,12 +1174,13 @@ class RAGEngine:
         if allowed_pages is not None and not allowed_page_set:
             return []
         if coverage_enabled and len(allowed_page_list) > top_k:
-            message = f"page_coverage_limited doc_id={doc_id} allowed_pages={len(allowed_page_list)} top_k={top_k}"
-            print(message, flush=True)
-            logger.info(message)
+            logger.info(
+                "page_coverage_limited doc_id=%s allowed_pages=%d top_k=%d",
+                doc_id, len(allowed_page_list), top_k,
+            )
 
         # Generate the query embedding.
-        query_embedding = (await self._get_embeddings([query], api_key))[0]
+        query_embedding = await self._get_query_embedding(query, api_key)
 
         # Run hybrid retrieval and combine rankings with RRF.
 
@@ -582,53 +1188,59 @@ class RAGEngine:
         # 1. Vector search.
         # Get enough candidates so we can filter OCR noise and still return top_k results.
         k_vector = max(top_k * 10, 50)
-        vector_results = self.collection.query(
-            query_embeddings=[query_embedding],
+        vector_results = await self._chroma_query(
+            query_embeddings=_as_unit_vectors([query_embedding]),
             where={"doc_id": doc_id},
-            n_results=k_vector
+            n_results=k_vector,
+            include=["documents", "metadatas", "distances"]
         )
+        # Text and metadata of every candidate, so the fused list needs no second Chroma round trip.
+        chunk_details = {}  # {chunk_id: (content, metadata)}
+        if vector_results["ids"] and vector_results["ids"][0]:
+            chunk_details.update(zip(
+                vector_results["ids"][0],
+                zip(vector_results["documents"][0], vector_results["metadatas"][0]),
+            ))
 
-        # 2. BM25 keyword search.
-        # Make sure the BM25 index exists first.
-        self._ensure_bm25_index(doc_id)
-
+        # 2. BM25 keyword search (builds the per-document index lazily on first use).
         bm25_top_n = []
-        if HAS_BM25 and doc_id in self.bm25_cache:
+        run_bm25 = self._should_run_bm25(query, vector_results, top_k, allowed_pages)
+        if run_bm25:
+            await self._ensure_bm25_index(doc_id)
+
+        if run_bm25 and doc_id in self.bm25_cache:
             cache = self.bm25_cache[doc_id]
             bm25 = cache["model"]
             doc_ids = cache["ids"]
+            doc_texts = cache["texts"]
+            doc_metadatas = cache["metadatas"]
 
             if bm25:
-                tokenized_query = self._tokenize(query)
-                # Score the query against the BM25 corpus.
-                doc_scores = bm25.get_scores(tokenized_query)
-
-                # Select the top-N matches. argsort returns ascending order, so reverse it.
-
-                import numpy as np
-                top_indices = np.argsort(doc_scores)[-k_vector:][::-1]
+                tokenized_query = list(self._tokenize_query(query))
+                # Score the query against the BM25 corpus (bm25s rejects an empty token list).
+                doc_scores = bm25.get_scores(tokenized_query) if tokenized_query else np.zeros(len(doc_ids))
+
+                # Select the top-N matches: partition out the best k in O(n), then sort only those.
+                doc_scores = np.asarray(doc_scores)
+                k = min(k_vector, doc_scores.size)
+                if k > 0:
+                    part = np.argpartition(-doc_scores, k - 1)[:k]
+                    top_indices = part[np.argsort(-doc_scores[part], kind="stable")]
+                else:
+                    top_indices = []
 
                 for idx in top_indices:
                     if doc_scores[idx] > 0:  # Keep only positive-scoring matches.
                         bm25_top_n.append(doc_ids[idx])
+                        chunk_details.setdefault(doc_ids[idx], (doc_texts[idx], doc_metadatas[idx]))
 
-        # 3. Reciprocal Rank Fusion (RRF).
-        # Score = 1 / (k + rank)
-        rrf_k = 60
-        final_scores = {}  # {chunk_id: score}
-
-        # Merge vector-search rankings.
-        if vector_results["ids"] and vector_results["ids"][0]:
-            for rank, chunk_id in enumerate(vector_results["ids"][0]):
-                final_scores[chunk_id] = final_scores.get(chunk_id, 0) + (1 / (rrf_k + rank + 1))
-
-        # Merge BM25 rankings.
-        for rank, chunk_id in enumerate(bm25_top_n):
-            final_scores[chunk_id] = final_scores.get(chunk_id, 0) + (1 / (rrf_k + rank + 1))
-
-        # 4. Sort candidates and fetch chunk details.
+        # 3. Reciprocal Rank Fusion (RRF) of the vector and BM25 rankings.
+        vector_ids = vector_results["ids"][0] if vector_results["ids"] else []
+        # Only the first candidate_limit fused ids are ever used (the reranker looks at the top 20).
+        candidate_limit = max(top_k * 20, 200)
+        candidate_ids = self._rrf_fuse([vector_ids, bm25_top_n], limit=candidate_limit)
 
-        candidate_ids = sorted(final_scores.keys(), key=lambda x: final_scores[x], reverse=True)
+        # 4. Fetch chunk details for the fused candidates.
 
         if not candidate_ids:
             return []
@@ -639,44 +1251,33 @@ class RAGEngine:
                 reranker = _get_reranker()
                 # 取前 min(20, len) 个候选送入 reranker，控制延迟
                 rerank_candidates = candidate_ids[:min(20, len(candidate_ids))]
-                raw = self.collection.get(
-                    ids=rerank_candidates,
-                    include=["documents"]
-                )
-                # ChromaDB .get() 返回顺序不保证，需对齐
-                id_to_text = dict(zip(raw["ids"], raw["documents"]))
-                pairs = [[query, id_to_text.get(cid, "")] for cid in rerank_candidates]
+                # 候选文本已随向量查询 / BM25 缓存取回，仅对缺失的 id 补一次 get
+                missing = [cid for cid in rerank_candidates if cid not in chunk_details]
+                if missing:
+                    raw = await self._chroma_get(ids=missing, include=["documents", "metadatas"])
+                    for cid, doc, meta in zip(raw["ids"], raw["documents"], raw["metadatas"]):
+                        chunk_details[cid] = (doc, meta)
+                pairs = [[query, chunk_details.get(cid, ("", None))[0]] for cid in rerank_candidates]
                 scores = reranker.predict(pairs, show_progress_bar=False)
                 reranked = [rerank_candidates[i]
                             for i in sorted(range(len(scores)),
                                             key=lambda x: scores[x], reverse=True)]
                 # 将 rerank 结果拼接剩余候选（未送入 reranker 的部分保持原顺序）
-                remaining = [cid for cid in candidate_ids if cid not in set(reranked)]
+                reranked_set = set(reranked)
+                remaining = [cid for cid in candidate_ids if cid not in reranked_set]
                 candidate_ids = reranked + remaining
-                print(f"[Reranker] reranked top-{len(reranked)} candidates", flush=True)
+                logger.debug("[Reranker] reranked top-%d candidates", len(reranked))
             except Exception as e:
-                print(f"[Reranker] reranking failed, fallback to RRF order: {e}", flush=True)
-
-        # 批量获取 chunk 详情。
-        # ChromaDB .get()
-        candidate_limit = max(top_k * 20, 200)
-        candidate_ids = candidate_ids[:candidate_limit]
-        final_chunks_data = self.collection.get(
-            ids=candidate_ids,
-            include=["documents", "metadatas"]
-        )
-
-        # 鎸?candidate_ids 椤哄簭鏋勫缓杩斿洖瀵硅薄銆?
-        id_map = {id_: i for i, id_ in enumerate(final_chunks_data["ids"])}
+                logger.warning("[Reranker] reranking failed, fallback to RRF order: %s", e)
 
+        # 按 candidate_ids 顺序构建返回对象。
         candidate_chunks: List[TextChunk] = []
         for chunk_id in candidate_ids:
-            if chunk_id not in id_map:
+            detail = chunk_details.get(chunk_id)
+            if detail is None:
                 continue
 
-            idx = id_map[chunk_id]
-            metadata = final_chunks_data["metadatas"][idx]
-            content = final_chunks_data["documents"][idx]
+            content, metadata = detail
             page_number = metadata["page"]
 
             if allowed_page_set and page_number not in allowed_page_set:
@@ -690,23 +1291,13 @@ class RAGEngine:
             bbox_y = metadata["bbox_y"]
             bbox_w = metadata["bbox_w"]
             bbox_h = metadata["bbox_h"]
-            bbox_lines_raw = metadata.get("bbox_lines")
-            if bbox_lines_raw:
-                try:
-                    bbox_lines = json.loads(bbox_lines_raw) if isinstance(bbox_lines_raw, str) else None
-                except Exception:
-                    bbox_lines = None
-
-                if isinstance(bbox_lines, list) and bbox_lines:
-                    lines = content.split("\n")
-                    li = self._select_best_line_index(query, lines[: len(bbox_lines)])
-                    li = max(0, min(li, len(bbox_lines) - 1))
-                    b = bbox_lines[li] or {}
-                    if all(k in b for k in ("x", "y", "w", "h")):
-                        bbox_x = float(b["x"])
-                        bbox_y = float(b["y"])
-                        bbox_w = float(b["w"])
-                        bbox_h = float(b["h"])
+            bbox_lines = _unpack_bbox_lines(metadata.get("bbox_lines"))
+            if bbox_lines:
+                lines = content.split("\n")
+                li = self._select_best_line_index(query, lines[: len(bbox_lines)])
+                li = max(0, min(li, len(bbox_lines) - 1))
+                if bbox_lines[li] is not None:
+                    bbox_x, bbox_y, bbox_w, bbox_h = bbox_lines[li]
 
             candidate_chunks.append(TextChunk(
                 id=chunk_id,
@@ -779,11 +1370,20 @@ class RAGEngine:
                             existing_ids.add(nid)
             if neighbor_ids:
                 try:
-                    nb_data = self.collection.get(
-                        ids=neighbor_ids,
-                        include=["documents", "metadatas"]
-                    )
-                    for nb_id, nb_doc, nb_meta in zip(nb_data["ids"], nb_data["documents"], nb_data["metadatas"]):
+                    nb_details = self._cached_chunk_details(doc_id, neighbor_ids)
+                    if nb_details is None:
+                        nb_data = await self._chroma_get(
+                            ids=neighbor_ids,
+                            include=["documents", "metadatas"]
+                        )
+                        nb_details = {
+                            nb_id: (nb_doc, nb_meta)
+                            for nb_id, nb_doc, nb_meta in zip(nb_data["ids"], nb_data["documents"], nb_data["metadatas"])
+                        }
+                    for nb_id in neighbor_ids:
+                        if nb_id not in nb_details:
+                            continue
+                        nb_doc, nb_meta = nb_details[nb_id]
                         if not nb_doc or self._is_low_value_text(nb_doc):
                             continue
                         if allowed_page_set and nb_meta.get("page") not in allowed_page_set:
@@ -806,17 +1406,19 @@ class RAGEngine:
                             block_id=nb_meta.get("block_id"),
                         ))
                 except Exception as e:
-                    print(f"[ContextExpand] neighbor fetch failed: {e}", flush=True)
+                    logger.warning("[ContextExpand] neighbor fetch failed: %s", e)
 
         for idx, chunk in enumerate(chunks):
             chunk.ref_id = f"ref-{idx + 1}"
 
         return chunks
 
-    def delete_document(self, doc_id: str):
+    async def delete_document(self, doc_id: str):
         """Delete all indexed data for a document."""
         try:
-            self.collection.delete(where={"doc_id": doc_id})
+            # Always delete by the doc_id predicate: the BM25 cache or snapshot may have been
+            # built from a read that raced a concurrent OCR write, so its id list can miss chunks.
+            await self._chroma_delete(where={"doc_id": doc_id})
             self._invalidate_bm25_cache(doc_id)
         except Exception:
             pass
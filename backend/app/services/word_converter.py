@@ -2,13 +2,40 @@
 
 from __future__ import annotations
 
+import asyncio
 import os
+import queue
 import shutil
+import socket
 import subprocess
+import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional, Sequence, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+UNOSERVER_HOST = os.getenv("UNOSERVER_HOST", "127.0.0.1")
+UNOSERVER_PORT = int(os.getenv("UNOSERVER_PORT", "2003") or "2003")
+UNOSERVER_POOL_SIZE = max(1, int(os.getenv("UNOSERVER_POOL_SIZE", "") or min(os.cpu_count() or 1, 4)))
+
+# Persistent LibreOffice (unoserver) instances started by the app lifespan, keyed by port.
+# Each instance converts one file at a time, so conversions check a port out of the idle queue.
+_unoserver_processes: Dict[int, subprocess.Popen] = {}
+_idle_unoserver_ports: "queue.Queue[int]" = queue.Queue()
+# Serializes stop_unoserver() with conversions returning their port to the idle queue.
+_unoserver_lock = threading.Lock()
+# How long a conversion waits for an idle instance before falling through to soffice.
+_UNOSERVER_WAIT_SEC = 30.0
+# Async conversions hold a default-executor thread for the whole engine chain, and that pool is
+# shared with Chroma/BM25 work; admit at most one conversion per unoserver instance.
+_conversion_slots = asyncio.Semaphore(UNOSERVER_POOL_SIZE)
+
+# Word COM (docx2pdf) runs on one dedicated thread with COM initialised, off the event loop.
+_com_executor: Optional[ThreadPoolExecutor] = None
+_com_executor_lock = threading.Lock()
 
 
 class WordConversionError(RuntimeError):
@@ -23,14 +50,14 @@ class ConversionResult:
 
 
 def _run_command(cmd: Sequence[str], timeout_sec: int = 180) -> Tuple[bool, str]:
+    # Converters report progress on stdout and nothing we read; only stderr is kept, as raw
+    # bytes, and decoded when the command fails.
     try:
         completed = subprocess.run(
             list(cmd),
             check=False,
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            errors="ignore",
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
             timeout=timeout_sec,
         )
     except FileNotFoundError as exc:
@@ -43,7 +70,7 @@ def _run_command(cmd: Sequence[str], timeout_sec: int = 180) -> Tuple[bool, str]
     if completed.returncode == 0:
         return True, ""
 
-    details = (completed.stderr or completed.stdout or "").strip()
+    details = (completed.stderr or b"").decode("utf-8", errors="ignore").strip()
     if not details:
         details = f"exit code {completed.returncode}"
     return False, details
@@ -97,11 +124,122 @@ def _convert_with_docx2pdf(input_path: str, output_pdf_path: str) -> Tuple[bool,
         return False, f"docx2pdf failed: {exc}"
 
 
+def _unoserver_listening(port: int, timeout_sec: float = 0.5) -> bool:
+    try:
+        with socket.create_connection((UNOSERVER_HOST, port), timeout=timeout_sec):
+            return True
+    except OSError:
+        return False
+
+
+def _unoserver_daemon_alive(port: Optional[int] = None) -> bool:
+    if port is not None:
+        process = _unoserver_processes.get(port)
+        return process is not None and process.poll() is None
+    return any(process.poll() is None for process in _unoserver_processes.values())
+
+
+def start_unoserver() -> bool:
+    """Start a pool of persistent unoservers so conversions skip LibreOffice's per-call cold start."""
+    if _unoserver_daemon_alive():
+        return True
+    if _unoserver_listening(UNOSERVER_PORT):
+        # An externally managed unoserver already serves the configured port.
+        return True
+    unoserver = shutil.which("unoserver")
+    if not unoserver:
+        return False
+    # Do not wait for readiness here; LibreOffice takes a few seconds to come up and
+    # _convert_with_unoserver waits for the port while its daemon is alive. Each instance
+    # needs its own UNO port and user profile to run side by side.
+    for index in range(UNOSERVER_POOL_SIZE):
+        port = UNOSERVER_PORT + index
+        profile_dir = Path(tempfile.gettempdir()) / f"pdfqa-unoserver-{port}"
+        _unoserver_processes[port] = subprocess.Popen(
+            [
+                unoserver,
+                "--interface",
+                UNOSERVER_HOST,
+                "--port",
+                str(port),
+                "--uno-port",
+                str(UNOSERVER_PORT + UNOSERVER_POOL_SIZE + index),
+                "--user-installation",
+                profile_dir.as_uri(),
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        _idle_unoserver_ports.put(port)
+    return True
+
+
+def stop_unoserver() -> None:
+    with _unoserver_lock:
+        processes = list(_unoserver_processes.values())
+        _unoserver_processes.clear()
+        while not _idle_unoserver_ports.empty():
+            _idle_unoserver_ports.get_nowait()
+    for process in processes:
+        if process.poll() is None:
+            process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
 def _convert_with_unoserver(input_path: str, output_pdf_path: str) -> Tuple[bool, str]:
     unoconvert = shutil.which("unoconvert")
     if not unoconvert:
         return False, "unoconvert executable not found"
-    return _run_command([unoconvert, input_path, output_pdf_path])
+
+    if not _unoserver_processes:
+        return _run_unoconvert(unoconvert, UNOSERVER_PORT, input_path, output_pdf_path)
+
+    deadline = time.monotonic() + _UNOSERVER_WAIT_SEC
+    while True:
+        try:
+            port = _idle_unoserver_ports.get(timeout=1.0)
+            break
+        except queue.Empty:
+            if not _unoserver_processes:
+                return False, "unoserver pool stopped"
+            if time.monotonic() >= deadline:
+                return False, f"no idle unoserver instance after {_UNOSERVER_WAIT_SEC:.0f}s"
+    try:
+        return _run_unoconvert(unoconvert, port, input_path, output_pdf_path)
+    finally:
+        with _unoserver_lock:
+            # After stop_unoserver() the port is gone; do not refill the drained queue.
+            if port in _unoserver_processes:
+                _idle_unoserver_ports.put(port)
+
+
+def _run_unoconvert(unoconvert: str, port: int, input_path: str, output_pdf_path: str) -> Tuple[bool, str]:
+    # A freshly started daemon may still be booting LibreOffice; back off (0.5s doubling,
+    # 7.5s in total) until it listens.
+    delay = 0.5
+    while not _unoserver_listening(port):
+        if not _unoserver_daemon_alive(port) or delay > 4:
+            return False, f"unoserver is not listening on {UNOSERVER_HOST}:{port}"
+        time.sleep(delay)
+        delay *= 2
+
+    return _run_command(
+        [
+            unoconvert,
+            "--host",
+            UNOSERVER_HOST,
+            "--port",
+            str(port),
+            input_path,
+            output_pdf_path,
+        ]
+    )
 
 
 def _convert_with_soffice(input_path: str, output_pdf_path: str) -> Tuple[bool, str]:
@@ -141,23 +279,67 @@ def _convert_with_soffice(input_path: str, output_pdf_path: str) -> Tuple[bool,
     return False, "soffice finished but output pdf not found"
 
 
-def convert_to_pdf(input_path: str, output_pdf_path: str) -> ConversionResult:
+Converter = Callable[[str, str], Tuple[bool, str]]
+# run(converter, pinned, input_path, output_pdf_path) -> (ok, error)
+Runner = Callable[[Converter, bool, str, str], Tuple[bool, str]]
+
+# (engine, converter, needs the Word COM thread)
+_CONVERSION_ENGINES = (
+    ("mammoth+fitz", _convert_with_mammoth_fitz, False),
+    # Word COM is initialised per thread; async conversions run docx2pdf on the COM thread.
+    ("docx2pdf", _convert_with_docx2pdf, True),
+    ("unoserver", _convert_with_unoserver, False),
+    ("soffice", _convert_with_soffice, False),
+)
+
+
+def _engine_order() -> Tuple[Tuple[str, Converter, bool], ...]:
+    """Lead with the warm unoserver pool when it runs: LibreOffice renders layout faithfully,
+    while mammoth+fitz goes through HTML and drops much of it."""
+    if not _unoserver_daemon_alive():
+        return _CONVERSION_ENGINES
+    primary = tuple(item for item in _CONVERSION_ENGINES if item[0] == "unoserver")
+    return primary + tuple(item for item in _CONVERSION_ENGINES if item[0] != "unoserver")
+
+
+def _prepare_output(input_path: str, output_pdf_path: str) -> Tuple[Path, Path]:
     src = Path(input_path).resolve()
     out = Path(output_pdf_path).resolve()
     out.parent.mkdir(parents=True, exist_ok=True)
     if out.exists():
         out.unlink()
+    return src, out
+
+
+def _init_com() -> None:
+    try:
+        import pythoncom  # type: ignore
+    except ImportError:
+        return
+    pythoncom.CoInitialize()
+
 
+def _get_com_executor() -> ThreadPoolExecutor:
+    global _com_executor
+    with _com_executor_lock:
+        if _com_executor is None:
+            _com_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="word-com", initializer=_init_com
+            )
+        return _com_executor
+
+
+def _run_here(fn: Converter, pinned: bool, input_path: str, output_pdf_path: str) -> Tuple[bool, str]:
+    return fn(input_path, output_pdf_path)
+
+
+def _convert(input_path: str, output_pdf_path: str, run: Runner) -> ConversionResult:
+    src, out = _prepare_output(input_path, output_pdf_path)
     start = time.perf_counter()
     errors: List[str] = []
 
-    for engine, fn in (
-        ("mammoth+fitz", _convert_with_mammoth_fitz),
-        ("docx2pdf", _convert_with_docx2pdf),
-        ("unoserver", _convert_with_unoserver),
-        ("soffice", _convert_with_soffice),
-    ):
-        ok, err = fn(str(src), str(out))
+    for engine, fn, pinned in _engine_order():
+        ok, err = run(fn, pinned, str(src), str(out))
         if ok and out.exists():
             elapsed_ms = int((time.perf_counter() - start) * 1000)
             return ConversionResult(output_pdf_path=str(out), engine=engine, elapsed_ms=elapsed_ms)
@@ -167,6 +349,27 @@ def convert_to_pdf(input_path: str, output_pdf_path: str) -> ConversionResult:
     raise WordConversionError(f"failed to convert '{src.name}' to PDF ({joined})")
 
 
+def convert_to_pdf(input_path: str, output_pdf_path: str) -> ConversionResult:
+    return _convert(input_path, output_pdf_path, _run_here)
+
+
+async def convert_to_pdf_async(input_path: str, output_pdf_path: str) -> ConversionResult:
+    """convert_to_pdf for the event loop.
+
+    The engine chain runs in a worker thread, so PyMuPDF and the LibreOffice subprocesses
+    do not block the loop and concurrent uploads convert in parallel across the unoserver
+    pool. docx2pdf (Word COM) runs on its dedicated COM thread.
+    """
+
+    def run(fn: Converter, pinned: bool, src: str, out: str) -> Tuple[bool, str]:
+        if pinned:
+            return _get_com_executor().submit(fn, src, out).result()
+        return fn(src, out)
+
+    async with _conversion_slots:
+        return await asyncio.to_thread(_convert, input_path, output_pdf_path, run)
+
+
 def extract_markdown_with_markitdown(path: str) -> Tuple[str, Optional[str]]:
     """Best-effort markdown extraction for .docx fallback indexing."""
     try:
@@ -1,8 +1,32 @@
 """
 检查 ChromaDB 中存储的文档数据
 """
+import argparse
+import os
+import sys
+
 import chromadb
 from chromadb.config import Settings
+from dotenv import load_dotenv
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BACKEND_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# 与 main.py 相同：优先 backend/.env，其次仓库根目录 .env（EMBEDDING_DIMENSIONS 决定集合名）
+for env_path in (os.path.join(BACKEND_DIR, ".env"), os.path.join(PROJECT_ROOT, ".env")):
+    if os.path.exists(env_path):
+        load_dotenv(env_path)
+        break
+
+from app.services.rag_engine import collection_name  # noqa: E402
+
+parser = argparse.ArgumentParser(description="Inspect chunks stored in the ChromaDB collection.")
+parser.add_argument("--offset", type=int, default=0, help="first row to show")
+parser.add_argument("--limit", type=int, default=5, help="rows per page")
+parser.add_argument("--pages", type=int, default=1, help="number of pages to walk (0 = until the end)")
+args = parser.parse_args()
 
 # 连接到同一个数据库
 client = chromadb.PersistentClient(
@@ -12,31 +36,38 @@ client = chromadb.PersistentClient(
 
 # 获取 collection
 try:
-    collection = client.get_collection("documents_v3")
-    
-    # 获取所有文档
-    results = collection.get(
-        limit=10,
-        include=["documents", "metadatas"]
-    )
-    
+    collection = client.get_collection(collection_name(), embedding_function=None)
+
     print(f"Total documents in collection: {collection.count()}")
-    print(f"\nFirst 5 documents:")
-    
-    for i, (doc_id, doc, metadata) in enumerate(zip(
-        results["ids"][:5], 
-        results["documents"][:5], 
-        results["metadatas"][:5]
-    )):
-        print(f"\n--- Document {i+1} ---")
-        print(f"ID: {doc_id}")
-        print(f"Content preview: {doc[:50]}...")
-        print(f"Metadata: {metadata}")
-        print(f"  bbox_x: {metadata.get('bbox_x')}")
-        print(f"  bbox_y: {metadata.get('bbox_y')}")
-        print(f"  bbox_w: {metadata.get('bbox_w')}")
-        print(f"  bbox_h: {metadata.get('bbox_h')}")
-        print(f"  source: {metadata.get('source')}")
+
+    # 分页读取，只取 metadata；正文列最宽，仅为每页第一条单独取预览
+    offset = max(0, args.offset)
+    limit = max(1, args.limit)
+    pages_left = args.pages if args.pages > 0 else None
+    while pages_left is None or pages_left > 0:
+        results = collection.get(offset=offset, limit=limit, include=["metadatas"])
+        if not results["ids"]:
+            break
+
+        preview = collection.get(ids=results["ids"][:1], include=["documents"])
+        preview_text = (preview["documents"] or [""])[0] or ""
+        print(f"\nRows {offset + 1}-{offset + len(results['ids'])}:")
+
+        for i, (doc_id, metadata) in enumerate(zip(results["ids"], results["metadatas"])):
+            print(f"\n--- Document {offset + i + 1} ---")
+            print(f"ID: {doc_id}")
+            if i == 0:
+                print(f"Content preview: {preview_text[:50]}...")
+            print(f"Metadata: {metadata}")
+            print(f"  bbox_x: {metadata.get('bbox_x')}")
+            print(f"  bbox_y: {metadata.get('bbox_y')}")
+            print(f"  bbox_w: {metadata.get('bbox_w')}")
+            print(f"  bbox_h: {metadata.get('bbox_h')}")
+            print(f"  source: {metadata.get('source')}")
+
+        offset += limit
+        if pages_left is not None:
+            pages_left -= 1
 
 except Exception as e:
     print(f"Error: {e}")
@@ -29,6 +29,9 @@ if sys.platform == 'win32':
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
 from app.routers import audit_profiles, chat, documents, ocr  # noqa: E402
+from app.services.mm_provider import get_multimodal_provider  # noqa: E402
+from app.services.rag_engine import rag_engine  # noqa: E402
+from app.services.word_converter import start_unoserver, stop_unoserver  # noqa: E402
 
 
 @asynccontextmanager
@@ -46,6 +49,23 @@ async def lifespan(app: FastAPI):
     except Exception as exc:
         print(f"[DOC_STORE] Failed to load persisted documents: {exc}")
 
+    try:
+        await rag_engine.warm_up()
+    except Exception as exc:
+        print(f"[RAG] Failed to warm up retrieval: {exc}")
+
+    try:
+        rag_engine.start_legacy_migration(list(documents.documents))
+    except Exception as exc:
+        print(f"[RAG] Failed to start legacy index migration: {exc}")
+
+    if os.getenv("UNOSERVER_AUTOSTART", "1").strip().lower() in {"1", "true", "yes", "y"}:
+        try:
+            if start_unoserver():
+                print("[WORD] unoserver daemon started for Word to PDF conversion")
+        except Exception as exc:
+            print(f"[WORD] Failed to start unoserver daemon: {exc}")
+
     try:
         await documents.start_ocr_worker()
     except Exception as exc:
@@ -68,6 +88,21 @@ async def lifespan(app: FastAPI):
     except Exception as exc:
         print(f"[AUDIT_QUEUE] Failed to stop multimodal audit worker: {exc}")
 
+    try:
+        await rag_engine.close()
+    except Exception as exc:
+        print(f"[RAG] Failed to close embedding HTTP client: {exc}")
+
+    try:
+        await get_multimodal_provider().close()
+    except Exception as exc:
+        print(f"[MULTIMODAL] Failed to close HTTP client: {exc}")
+
+    try:
+        stop_unoserver()
+    except Exception as exc:
+        print(f"[WORD] Failed to stop unoserver daemon: {exc}")
+
 
 app = FastAPI(
     title="PDF智能问答系统 V6.0",
@@ -78,22 +113,8 @@ app = FastAPI(
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        "http://localhost:5173",
-        "http://127.0.0.1:5173",
-        "http://localhost:3000",
-        "http://127.0.0.1:3000",
-        "http://localhost:3001",
-        "http://127.0.0.1:3001",
-        "http://localhost:3002",
-        "http://127.0.0.1:3002",
-        "http://localhost:3003",
-        "http://127.0.0.1:3003",
-        "http://localhost:3004",
-        "http://127.0.0.1:3004",
-        "http://localhost:3005",
-        "http://127.0.0.1:3005",
-    ],
+    # Vite (5173) and the dev ports 3000-3005 on localhost / 127.0.0.1, as one compiled pattern.
+    allow_origin_regex=r"^http://(localhost|127\.0\.0\.1):(5173|300[0-5])$",
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -4,12 +4,24 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
+import json
+import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Iterable, Iterator, Sequence
 
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:  # pragma: no cover - optional speedup for the result cache.
+    orjson = None  # type: ignore[assignment]
+    HAS_ORJSON = False
+
 
 DEFAULT_EXTENSIONS = {".ts", ".tsx", ".py", ".md", ".css", ".json"}
 DEFAULT_TARGETS = ("frontend/src", "backend/app", "CLAUDE.md")
@@ -24,6 +36,9 @@ SKIP_DIRS = {
     "build",
     "__pycache__",
 }
+# Below this many files, process start-up costs more than the scan itself.
+PARALLEL_MIN_FILES = 64
+CACHE_PATH = Path(__file__).resolve().parent.parent / ".cache" / "mojibake.json"
 
 # High-confidence mojibake fragments seen in UTF-8 <-> GBK double-encoding accidents.
 HIGH_CONFIDENCE_PATTERNS: Sequence[tuple[str, str]] = (
@@ -39,6 +54,9 @@ HIGH_CONFIDENCE_PATTERNS: Sequence[tuple[str, str]] = (
     ("閿欒", "error_token"),
 )
 
+# One C-level scan tells whether any high-confidence phrase is present at all.
+HIGH_CONFIDENCE_RE = re.compile("|".join(re.escape(pattern) for pattern, _ in HIGH_CONFIDENCE_PATTERNS))
+
 SUSPECT_CHAR_SET = set("澶鍙鏂娌璇锛銆鈥锟")
 NON_ASCII_RUN_RE = re.compile(r"[^\x00-\x7F]{3,}")
 CJK_RE = re.compile(r"[\u3400-\u9FFF]")
@@ -47,6 +65,10 @@ STRING_LITERAL_RE = re.compile(
     r"'(?:\\.|[^'\\])*'|\"(?:\\.|[^\"\\])*\"|`(?:\\.|[^`\\])*`"
 )
 CJK_QUESTION_RE = re.compile(r"[\u3400-\u9FFF]\?|\?[\u3400-\u9FFF]")
+# One line and its terminator, with the same boundaries as str.splitlines().
+LINE_RE = re.compile(
+    r"([^\n\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]*)(?:\r\n|[\n\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]|\Z)"
+)
 
 
 @dataclass(frozen=True)
@@ -79,6 +101,18 @@ def parse_args() -> argparse.Namespace:
         default=sorted(DEFAULT_EXTENSIONS),
         help="File extensions to scan, e.g. --ext .ts .tsx .py",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes for scanning (default: CPU count; 1 scans serially).",
+    )
+    parser.add_argument(
+        "--cache",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help=f"Reuse results for files whose mtime and size are unchanged ({CACHE_PATH}).",
+    )
     parser.add_argument(
         "--warn-only",
         action="store_true",
@@ -91,6 +125,17 @@ def should_skip_dir(path: Path) -> bool:
     return any(part in SKIP_DIRS for part in path.parts)
 
 
+def _walk_files(root: str, extensions: set[str]) -> Iterator[Path]:
+    # Prune skipped directories before descending instead of filtering every file under them.
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in SKIP_DIRS:
+                    yield from _walk_files(entry.path, extensions)
+            elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in extensions:
+                yield Path(entry.path)
+
+
 def iter_files(targets: Sequence[str], extensions: set[str]) -> Iterator[Path]:
     for raw_target in targets:
         target = Path(raw_target)
@@ -100,13 +145,9 @@ def iter_files(targets: Sequence[str], extensions: set[str]) -> Iterator[Path]:
             if target.suffix.lower() in extensions:
                 yield target
             continue
-        for file_path in target.rglob("*"):
-            if not file_path.is_file():
-                continue
-            if should_skip_dir(file_path):
-                continue
-            if file_path.suffix.lower() in extensions:
-                yield file_path
+        if should_skip_dir(target):
+            continue
+        yield from _walk_files(str(target), extensions)
 
 
 def line_has_mojibake(line: str) -> str | None:
@@ -117,39 +158,77 @@ def line_has_mojibake(line: str) -> str | None:
         if CJK_QUESTION_RE.search(literal):
             return "cjk_question_mark_in_literal"
 
-    for pattern, reason in HIGH_CONFIDENCE_PATTERNS:
-        if pattern in line:
-            return reason
+    if HIGH_CONFIDENCE_RE.search(line):
+        # Report the first phrase in list order (not position) when several are present.
+        for pattern, reason in HIGH_CONFIDENCE_PATTERNS:
+            if pattern in line:
+                return reason
 
     # High-confidence recovery check for UTF-8 <-> GBK mojibake chunks.
     for chunk in NON_ASCII_RUN_RE.findall(line):
-        try:
-            recovered = chunk.encode("gbk").decode("utf-8")
-        except (UnicodeEncodeError, UnicodeDecodeError):
-            continue
-
-        if recovered != chunk and CJK_RE.search(recovered):
+        if _gbk_roundtrip_hit(chunk):
             return "gbk_utf8_roundtrip"
 
-    suspect_char_hits = sum(1 for ch in line if ch in SUSPECT_CHAR_SET)
+    suspect_char_hits = sum(map(line.count, SUSPECT_CHAR_SET))
     if suspect_char_hits >= 3:
         return "suspicious_char_cluster"
 
     return None
 
 
+def _gbk_roundtrip_hit(chunk: str) -> bool:
+    try:
+        recovered = chunk.encode("gbk").decode("utf-8")
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return False
+    return recovered != chunk and bool(CJK_RE.search(recovered))
+
+
+def iter_lines(text: str) -> Iterator[str]:
+    """Lazy str.splitlines(): yields lines without building the whole list."""
+    for match in LINE_RE.finditer(text):
+        if match.end() == len(text) and not match.group(0):
+            break
+        yield match.group(1)
+
+
+def text_may_have_mojibake(text: str) -> bool:
+    """File-wide version of line_has_mojibake's checks; False means no line can be flagged.
+
+    Every check is local to a line (line breaks are ASCII, so non-ASCII runs never cross
+    them), except for the non-ASCII separators splitlines() also honours; those fall back
+    to the per-line walk.
+    """
+    if text.isascii():
+        return False
+    if "\x85" in text or "\u2028" in text or "\u2029" in text:
+        return True
+    if PRIVATE_USE_RE.search(text) or CJK_QUESTION_RE.search(text) or HIGH_CONFIDENCE_RE.search(text):
+        return True
+    if sum(map(text.count, SUSPECT_CHAR_SET)) >= 3:
+        return True
+    return any(_gbk_roundtrip_hit(chunk) for chunk in NON_ASCII_RUN_RE.findall(text))
+
+
 def scan_file(path: Path) -> Iterable[Issue]:
     raw = path.read_bytes()
     issues: list[Issue] = []
     if raw.startswith(b"\xef\xbb\xbf"):
         issues.append(Issue(path=path, line=1, reason="utf8_bom", snippet="UTF-8 BOM detected"))
+    elif raw.isascii():
+        # Pure ASCII is valid UTF-8 and cannot hold mojibake; skip decoding it at all.
+        return issues
 
     try:
         text = raw.decode("utf-8")
     except UnicodeDecodeError:
         return [Issue(path=path, line=1, reason="decode_error", snippet="cannot decode as UTF-8")]
 
-    for line_num, line in enumerate(text.splitlines(), start=1):
+    # Most files are clean; one file-wide pass avoids splitting and walking every line.
+    if not text_may_have_mojibake(text):
+        return issues
+
+    for line_num, line in enumerate(iter_lines(text), start=1):
         reason = line_has_mojibake(line)
         if not reason:
             continue
@@ -161,14 +240,79 @@ def scan_file(path: Path) -> Iterable[Issue]:
     return issues
 
 
+def scan_files(files: Sequence[Path], jobs: int) -> list[list[Issue]]:
+    if jobs > 1 and len(files) >= PARALLEL_MIN_FILES:
+        # Files are independent; map() keeps results in file order so the report is unchanged.
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            return [list(issues) for issues in executor.map(scan_file, files, chunksize=32)]
+    return [list(scan_file(file_path)) for file_path in files]
+
+
+def _checker_fingerprint() -> str:
+    # Any edit to this script invalidates cached results.
+    return hashlib.blake2b(Path(__file__).read_bytes(), digest_size=16).hexdigest()
+
+
+def load_cache(path: Path, fingerprint: str) -> dict[str, list]:
+    """Cached results: absolute path -> [mtime_ns, size, [[line, reason, snippet], ...]]."""
+    try:
+        raw = path.read_bytes()
+        data = orjson.loads(raw) if HAS_ORJSON else json.loads(raw)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("checker") != fingerprint:
+        return {}
+    files = data.get("files")
+    return files if isinstance(files, dict) else {}
+
+
+def save_cache(path: Path, fingerprint: str, files: dict[str, list]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    payload = {"checker": fingerprint, "files": files}
+    if HAS_ORJSON:
+        tmp_path.write_bytes(orjson.dumps(payload))
+    else:
+        tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
 def main() -> int:
     args = parse_args()
     extensions = {ext if ext.startswith(".") else f".{ext}" for ext in args.ext}
     files = sorted(set(iter_files(args.targets, extensions)))
 
     all_issues: list[Issue] = []
-    for file_path in files:
-        all_issues.extend(scan_file(file_path))
+    if args.cache:
+        fingerprint = _checker_fingerprint()
+        cache = load_cache(CACHE_PATH, fingerprint)
+        results: dict[Path, list[Issue]] = {}
+        stale: list[tuple[Path, str, list[int]]] = []
+        for file_path in files:
+            key = os.path.abspath(file_path)
+            stat = file_path.stat()
+            stamp = [stat.st_mtime_ns, stat.st_size]
+            entry = cache.get(key)
+            if entry and entry[:2] == stamp:
+                results[file_path] = [
+                    Issue(path=file_path, line=line, reason=reason, snippet=snippet)
+                    for line, reason, snippet in entry[2]
+                ]
+            else:
+                stale.append((file_path, key, stamp))
+
+        scanned = scan_files([file_path for file_path, _, _ in stale], args.jobs)
+        for (file_path, key, stamp), issues in zip(stale, scanned):
+            results[file_path] = issues
+            cache[key] = [*stamp, [[issue.line, issue.reason, issue.snippet] for issue in issues]]
+        if stale:
+            save_cache(CACHE_PATH, fingerprint, cache)
+
+        for file_path in files:
+            all_issues.extend(results[file_path])
+    else:
+        for issues in scan_files(files, args.jobs):
+            all_issues.extend(issues)
 
     if all_issues:
         print(f"[mojibake-check] found {len(all_issues)} issue(s):")
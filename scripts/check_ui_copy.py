@@ -40,6 +40,9 @@ FORBIDDEN_PHRASES = [
     "Failed to attach PDF",
 ]
 
+# All phrases in one alternation: a single C-level scan tells whether any of them is present.
+FORBIDDEN_RE = re.compile("|".join(re.escape(phrase) for phrase in FORBIDDEN_PHRASES))
+
 STRING_LITERAL_RE = re.compile(
     r"'(?:\\.|[^'\\])*'|\"(?:\\.|[^\"\\])*\"|`(?:\\.|[^`\\])*`"
 )
@@ -52,12 +55,20 @@ def main() -> int:
         if not path.exists():
             continue
         text = path.read_text(encoding="utf-8")
+        # Clean files (the normal case) need one scan over the text, not a per-line walk.
+        if not FORBIDDEN_RE.search(text):
+            continue
         lines = text.splitlines()
         for idx, line in enumerate(lines, start=1):
+            if not FORBIDDEN_RE.search(line):
+                continue
             literals = [m.group(0)[1:-1] for m in STRING_LITERAL_RE.finditer(line)]
             if not literals:
                 continue
             for literal in literals:
+                if not FORBIDDEN_RE.search(literal):
+                    continue
+                # Phrases can overlap, so list every one contained in a hit literal, in list order.
                 for phrase in FORBIDDEN_PHRASES:
                     if phrase in literal:
                         snippet = re.sub(r"\s+", " ", line.strip())